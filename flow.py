@@ -2,6 +2,7 @@ from pocketflow import Flow
 # Import only component action documentation related nodes
 from nodes import (
     FetchRepo,
+    ClusterNearDuplicates,
     IdentifyAbstractions,
     AnalyzeRelationships,
     ComponentActionDocumentation,
@@ -16,13 +17,14 @@ def create_component_action_flow():
     """Create a flow that generates component action documentation."""
     # Create nodes
     fetch_repo = FetchRepo()
+    cluster_near_duplicates = ClusterNearDuplicates()
     identify_abstractions = IdentifyAbstractions()
     analyze_relationships = AnalyzeRelationships()
     component_action_documentation = ComponentActionDocumentation()
     convert_doc_to_csv = ConvertDocToCSV()
     
     # Connect nodes in sequence
-    fetch_repo >> identify_abstractions >> analyze_relationships >> component_action_documentation >> convert_doc_to_csv
+    fetch_repo >> cluster_near_duplicates >> identify_abstractions >> analyze_relationships >> component_action_documentation >> convert_doc_to_csv
     
     # Create flow starting with the fetch repo node
     return Flow(start=fetch_repo)
@@ -52,6 +54,7 @@ def create_combined_flow():
     """
     # Create nodes
     fetch_repo = FetchRepo()
+    cluster_near_duplicates = ClusterNearDuplicates()
     
     # Component action documentation nodes
     identify_abstractions = IdentifyAbstractions()
@@ -65,7 +68,7 @@ def create_combined_flow():
     generate_document = GenerateBusinessLogicDocument()
     
     # Connect nodes in sequence - first component action documentation
-    fetch_repo >> identify_abstractions >> analyze_relationships >> component_action_documentation
+    fetch_repo >> cluster_near_duplicates >> identify_abstractions >> analyze_relationships >> component_action_documentation
     
     # Then CSV extraction
     component_action_documentation >> convert_doc_to_csv
@@ -6,20 +6,12 @@ from flow import create_component_action_flow, create_business_logic_flow, creat
 # Load environment variables
 dotenv.load_dotenv()
 
-# Default file patterns
-DEFAULT_INCLUDE_PATTERNS = {
-    "*.py", "*.js", "*.jsx", "*.ts", "*.tsx", "*.go", "*.java", "*.pyi", "*.pyx",
-    "*.c", "*.cc", "*.cpp", "*.h", "*.md", "*.rst", "Dockerfile",
-    "Makefile", "*.yaml", "*.yml", "*.aspx", "*.aspx.cs", "*.aspx.designer.cs", "*.css",
-    "*.sql", "*.proc", "*.stored_procedure"  # Added SQL-specific patterns
-}
-
-DEFAULT_EXCLUDE_PATTERNS = {
-    "*test*", "tests/*", "docs/*", "examples/*", "v1/*",
-    "dist/*", "build/*", "experimental/*", "deprecated/*",
-    "legacy/*", ".git/*", ".github/*", ".next/*", ".vscode/*", "obj/*", "bin/*", "node_modules/*", "*.log",
-    "*.jpg", "*.png", "*.xlsx", "*.rdlc", "*.pdf"
-}
+# Default file patterns (shared with run_agent.py and streamlit_app.py)
+from utils.file_filter import DEFAULT_INCLUDE_PATTERNS, DEFAULT_EXCLUDE_PATTERNS
+from utils.content_store import DEFAULT_CACHE_DIR
+from utils.crawl_github_files import GITHUB_MODES
+from utils.file_dedup import format_dedup_stats
+from utils.call_llm import cache_stats
 
 def main():
     parser = argparse.ArgumentParser(description="QA Documentation Generator")
@@ -28,6 +20,7 @@ def main():
     source_group = parser.add_mutually_exclusive_group(required=True)
     source_group.add_argument("--repo", help="URL of the GitHub repository.")
     source_group.add_argument("--dir", help="Path to local directory.")
+    source_group.add_argument("--archive", help="Path to a zip or tar archive of the project (read without extracting).")
     
     # Add other arguments
     parser.add_argument("-n", "--name", help="Project name (optional, derived from repo/directory if omitted).")
@@ -37,6 +30,14 @@ def main():
     parser.add_argument("-e", "--exclude", nargs="+", help="Exclude file patterns (e.g. 'tests/*' 'docs/*'). Defaults to test/build directories if not specified.")
     parser.add_argument("-s", "--max-size", type=int, default=100000, help="Maximum file size in bytes (default: 100000, about 100KB).")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output for debugging.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"Directory for crawl caches used by incremental runs (default: {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the crawl cache: reread every local file and refetch every GitHub response.")
+    parser.add_argument("--ref", help="Branch, tag or commit to crawl with --repo (required to pick one for SSH URLs; default: the default branch).")
+    parser.add_argument("--subdir", help="Only crawl this subdirectory of --repo (like /tree/<ref>/<path> in HTTPS URLs).")
+    parser.add_argument("--since", help="Only document files changed since this git ref (plus same-stem siblings as context). Works with --repo and with --dir inside a git work tree.")
+    parser.add_argument("--github-mode", choices=GITHUB_MODES, default="api", help="How to fetch --repo: 'api' lists the tree and downloads matching files, 'tarball' streams one archive of the ref, 'mirror' fetches into a persistent bare mirror under --cache-dir (default: api).")
+    parser.add_argument("--no-gitignore", action="store_true", help="With --dir, list files by walking the directory instead of asking git, and ignore .gitignore files.")
+    parser.add_argument("-w", "--workers", type=int, help="Number of concurrent file reads/downloads (default: 8 for GitHub, based on CPU count for local directories).")
     
     # Processing mode flags - fixed to use mutually exclusive group properly
     mode_group = parser.add_mutually_exclusive_group()
@@ -51,7 +52,7 @@ def main():
     github_token = None
     if args.repo:
         github_token = args.token or os.environ.get('GITHUB_TOKEN')
-        if not github_token:
+        if not github_token and not os.environ.get('GITHUB_TOKENS'):
             print("Warning: No GitHub token provided. You might hit rate limits for public repositories.")
     
     # Create the output directory if it doesn't exist
@@ -61,6 +62,7 @@ def main():
     shared = {
         "repo_url": args.repo,
         "local_dir": args.dir,
+        "archive": args.archive,
         "project_name": args.name,  # Can be None, FetchRepo will derive it
         "github_token": github_token,
         "output_dir": args.output,
@@ -70,6 +72,13 @@ def main():
         "exclude_patterns": set(args.exclude) if args.exclude else DEFAULT_EXCLUDE_PATTERNS,
         "max_file_size": args.max_size,
         "verbose": args.verbose,
+        "cache_dir": None if args.no_cache else args.cache_dir,
+        "max_workers": args.workers,
+        "github_mode": args.github_mode,
+        "ref": args.ref,
+        "subdir": args.subdir,
+        "since": args.since,
+        "respect_gitignore": not args.no_gitignore,
         
         # These will be populated by nodes
         "files": [],
@@ -78,7 +87,7 @@ def main():
     }
     
     # Display starting message
-    source_path = args.repo or args.dir
+    source_path = args.repo or args.dir or args.archive
     print(f"Starting documentation generation for: {source_path}")
     print(f"Include patterns: {', '.join(shared['include_patterns'])}")
     print(f"Exclude patterns: {', '.join(shared['exclude_patterns'])}")
@@ -143,6 +152,12 @@ def main():
             flow = create_component_action_flow()
             flow.run(shared)
             print(f"QA documentation generated successfully in {args.output}/")
+
+        if shared.get("dedup_stats"):
+            print(f"Dedup savings: {format_dedup_stats(shared['dedup_stats'])}")
+        llm_stats = cache_stats()
+        print(f"LLM memory cache: {llm_stats['hits']} hits, {llm_stats['misses']} misses, "
+              f"{llm_stats['evictions']} evictions, {llm_stats['bytes']} bytes held")
     except Exception as e:
         print(f"Error during documentation generation: {e}")
         if args.verbose:
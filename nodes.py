@@ -5,18 +5,38 @@ import yaml
 import csv
 import time
 import datetime
+import itertools
 from pocketflow import Node
-from utils.crawl_github_files import crawl_github_files
+from utils.crawl_github_files import iter_github_files, DEFAULT_FETCH_WORKERS
 from utils.call_llm import call_llm
-from utils.crawl_local_files import crawl_local_files
+from utils.crawl_local_files import iter_local_files
+from utils.crawl_manifest import CrawlManifest
+from utils.crawl_archive import iter_archive_files, archive_name, ARCHIVE_EXTENSIONS
+from utils.file_dedup import find_duplicates, group_duplicates, format_dedup_stats
+from utils.near_duplicates import cluster_near_duplicates, compact_diff
+from utils.file_catalog import FileCatalog, FileRecord
+from utils.corpus import CorpusBuilder
+from utils.content_store import ContentStore, DEFAULT_OBJECT_CACHE_BYTES
 
 # Helper to get content for specific file indices
-def get_content_for_indices(files_data, indices):
+def get_content_for_indices(files_data, indices, catalog=None, near_duplicates=None):
+    indices = [i for i in indices if 0 <= i < len(files_data)]
+    paths = files_data.paths
+    shown = set(indices)
+    near_duplicates = near_duplicates or {}
     content_map = {}
-    for i in indices:
-        if 0 <= i < len(files_data):
-            path, content = files_data[i]
-            content_map[f"{i} # {path}"] = content # Use index + path as key for context
+    # Identical files share one entry whose key lists every copy
+    for i, copies in group_duplicates(catalog, indices):
+        path, content = files_data[i]
+        key = f"{i} # {path}" # Use index + path as key for context
+        if copies:
+            key += " (identical: " + ", ".join(f"{j} # {paths[j]}" for j in copies) + ")"
+        # A near-copy is sent as a diff when its representative is in the same context
+        near = near_duplicates.get(i)
+        if near and near["representative"] in shown:
+            key += f" (diff against {near['representative']} # {paths[near['representative']]})"
+            content = near["diff"]
+        content_map[key] = content
     return content_map
 
 class FetchRepo(Node):
@@ -24,13 +44,22 @@ class FetchRepo(Node):
         repo_url = shared.get("repo_url")
         local_dir = shared.get("local_dir")
         project_name = shared.get("project_name")
+
+        # Archives may be given as one path/file object or a list of them
+        archives = shared.get("archive") or []
+        if not isinstance(archives, (list, tuple)):
+            archives = [archives]
         
         if not project_name:
-            # Basic name derivation from URL or directory
+            # Basic name derivation from URL, directory or archive
             if repo_url:
                 project_name = repo_url.split('/')[-1].replace('.git', '')
-            else:
+            elif local_dir:
                 project_name = os.path.basename(os.path.abspath(local_dir))
+            else:
+                name = archive_name(archives[0])
+                project_name = next((name[:-len(ext)] for ext in ARCHIVE_EXTENSIONS
+                                     if name.lower().endswith(ext)), name)
             shared["project_name"] = project_name
 
         # Get file patterns directly from shared
@@ -41,61 +70,227 @@ class FetchRepo(Node):
         return {
             "repo_url": repo_url,
             "local_dir": local_dir,
+            "archives": list(archives),
             "token": shared.get("github_token"),
+            "github_mode": shared.get("github_mode", "api"),
+            "ref": shared.get("ref"),
+            "subdir": shared.get("subdir"),
+            "since": shared.get("since"),  # Only crawl files changed since this ref
+            "respect_gitignore": shared.get("respect_gitignore", True),
             "include_patterns": include_patterns,
             "exclude_patterns": exclude_patterns,
             "max_file_size": max_file_size,
-            "use_relative_paths": True
+            "use_relative_paths": True,
+            "cache_dir": shared.get("cache_dir"),  # None disables incremental crawling
+            "max_workers": shared.get("max_workers")  # None uses each crawler's default
         }
 
     def exec(self, prep_res):
+        stats = {}
         if prep_res["repo_url"]:
             print(f"Crawling repository: {prep_res['repo_url']}...")
-            result = crawl_github_files(
+            records = iter_github_files(
                 repo_url=prep_res["repo_url"],
                 token=prep_res["token"],
                 include_patterns=prep_res["include_patterns"],
                 exclude_patterns=prep_res["exclude_patterns"],
                 max_file_size=prep_res["max_file_size"],
-                use_relative_paths=prep_res["use_relative_paths"]
+                use_relative_paths=prep_res["use_relative_paths"],
+                stats=stats,
+                max_workers=prep_res["max_workers"] or DEFAULT_FETCH_WORKERS,
+                mode=prep_res["github_mode"],
+                cache_dir=prep_res["cache_dir"],
+                ref=prep_res["ref"],
+                subdir=prep_res["subdir"],
+                since=prep_res["since"]
             )
         else:
-            print(f"Crawling directory: {prep_res['local_dir']}...")
-            result = crawl_local_files(
-                directory=prep_res["local_dir"],
-                include_patterns=prep_res["include_patterns"],
-                exclude_patterns=prep_res["exclude_patterns"],
-                max_file_size=prep_res["max_file_size"],
-                use_relative_paths=prep_res["use_relative_paths"]
-            )
+            sources = []
+            if prep_res["local_dir"]:
+                print(f"Crawling directory: {prep_res['local_dir']}...")
+                # Reuse the previous run's snapshot so only changed files are reread
+                manifest = None
+                if prep_res["cache_dir"] and not prep_res["since"]:
+                    manifest = CrawlManifest(prep_res["local_dir"], cache_dir=prep_res["cache_dir"])
+                sources.append(iter_local_files(
+                    directory=prep_res["local_dir"],
+                    include_patterns=prep_res["include_patterns"],
+                    exclude_patterns=prep_res["exclude_patterns"],
+                    max_file_size=prep_res["max_file_size"],
+                    use_relative_paths=prep_res["use_relative_paths"],
+                    max_workers=prep_res["max_workers"],
+                    manifest=manifest,
+                    stats=stats,
+                    since=prep_res["since"],
+                    respect_gitignore=prep_res["respect_gitignore"]
+                ))
+            if prep_res["archives"] and prep_res["since"]:
+                print("Warning: --since does not apply to archives; reading all matching members.")
+            # When several sources are combined, archive members are placed under the
+            # archive's name so paths stay unique (e.g. src/app.py in two uploaded zips)
+            combined = len(prep_res["archives"]) + bool(prep_res["local_dir"]) > 1
+            prefixes = set()
+            for archive in prep_res["archives"]:
+                prefix = None
+                if combined:
+                    prefix = name = archive_name(archive)
+                    n = 2
+                    while prefix in prefixes:
+                        prefix = f"{name}~{n}"
+                        n += 1
+                    prefixes.add(prefix)
+                # Members are streamed straight out of the archive, nothing is extracted
+                sources.append(iter_archive_files(
+                    archive,
+                    include_patterns=prep_res["include_patterns"],
+                    exclude_patterns=prep_res["exclude_patterns"],
+                    max_file_size=prep_res["max_file_size"],
+                    prefix=prefix
+                ))
+            records = itertools.chain.from_iterable(sources)
             
-        # Convert dict to list of tuples: [(path, content), ...]
-        files_list = list(result.get("files", {}).items())
-        print(f"Fetched {len(files_list)} files.")
-        return files_list
+        # Consume the crawl stream record by record into one contiguous corpus buffer
+        # (no per-file str kept alive; the crawler bounds its in-flight reads) and
+        # classify every file once, so nodes query the catalog instead of rescanning
+        # With a cache dir, bodies go to the content store and shared["files"] holds
+        # lazy handles; without one they are packed into an in-memory buffer
+        store = ContentStore(os.path.join(prep_res["cache_dir"], "objects")) if prep_res["cache_dir"] else None
+        builder = CorpusBuilder(store)
+        file_records = []
+        for path, content in records:
+            data = content.encode("utf-8")
+            record = FileRecord(len(file_records), path, data)
+            # Identical bodies share one span of the buffer
+            builder.add(path, data, record.content_hash)
+            file_records.append(record)
+        files = builder.build()
+        if store is not None:
+            # Keep the store bounded, never evicting a body this run refers to; nothing
+            # is evicted while another run still reads bodies from the store
+            evicted = store.prune(DEFAULT_OBJECT_CACHE_BYTES, keep={r.content_hash for r in file_records},
+                                  lease=files.lease)
+            if evicted:
+                print(f"Content store: {evicted} least recently used bodies evicted.")
+        catalog = FileCatalog(file_records)
+        print(f"Fetched {len(files)} files.")
+
+        # Byte-identical files (copied designer stubs, vendored JS, per-environment
+        # SQL scripts) are aliased to one canonical file so prompts include it only once
+        aliases, dedup_stats = find_duplicates(catalog)
+        if aliases:
+            print(f"Deduplicated: {format_dedup_stats(dedup_stats)}.")
+
+        changes = stats.get("changes")
+        if changes:
+            if changes["is_noop"]:
+                print("No changes since the last crawl.")
+            else:
+                print(f"Changes since the last crawl: {len(changes['added'])} added, "
+                      f"{len(changes['changed'])} changed, {len(changes['deleted'])} deleted.")
+        return {
+            "files": files,
+            "catalog": catalog,
+            "aliases": aliases,
+            "dedup_stats": dedup_stats,
+            "changes": changes,
+            "changed_paths": stats.get("changed_paths"),
+            "deleted_paths": stats.get("deleted_paths")
+        }
+
+    def post(self, shared, prep_res, exec_res):
+        # Corpus (one in-memory UTF-8 buffer) or StoredCorpus (lazy handles into the
+        # content store): index -> (path, content)
+        shared["files"] = exec_res["files"]
+        # FileCatalog of shared["files"]: per-file records plus by_role/by_language indexes
+        shared["file_catalog"] = exec_res["catalog"]
+        # {duplicate index: canonical index} for files whose content is identical
+        shared["file_aliases"] = exec_res["aliases"]
+        # {"unique_files", "duplicate_files", "duplicate_bytes", "total_bytes"}
+        shared["dedup_stats"] = exec_res["dedup_stats"]
+        # {"added": [...], "changed": [...], "deleted": [...], "is_noop": bool, ...} or None
+        shared["crawl_changes"] = exec_res["changes"]
+        # Paths changed/deleted since shared["since"] (None when not diffing); the
+        # remaining files are unchanged same-stem siblings fetched as context
+        shared["changed_paths"] = exec_res["changed_paths"]
+        shared["deleted_paths"] = exec_res["deleted_paths"]
+
+class ClusterNearDuplicates(Node):
+    """Cluster near-copies of files so prompts show one representative plus diffs."""
+
+    def prep(self, shared):
+        files_data = shared["files"]
+        aliases = shared.get("file_aliases") or {}
+        # Exact duplicates are already collapsed by FetchRepo
+        return files_data, [i for i in range(len(files_data)) if i not in aliases]
+
+    def exec(self, prep_res):
+        files_data, indices = prep_res
+        near_duplicates = {}
+        bytes_saved = 0
+        for cluster in cluster_near_duplicates(files_data, indices):
+            base_path, base_content = files_data[cluster[0]]
+            for i in cluster[1:]:
+                path, content = files_data[i]
+                diff = compact_diff(base_content, content, base_path, path)
+                if diff is None:
+                    continue
+                near_duplicates[i] = {"representative": cluster[0], "diff": diff}
+                bytes_saved += len(content) - len(diff)
+        if near_duplicates:
+            print(f"Found {len(near_duplicates)} near-duplicate files; "
+                  f"prompts send diffs instead, saving {bytes_saved} characters.")
+        return {"near_duplicates": near_duplicates, "bytes_saved": bytes_saved}
 
     def post(self, shared, prep_res, exec_res):
-        shared["files"] = exec_res # List of (path, content) tuples
+        # {index: {"representative": index, "diff": unified diff}} for near-copies
+        shared["near_duplicates"] = exec_res["near_duplicates"]
+        stats = shared.get("dedup_stats")
+        if stats is not None:
+            stats["near_duplicate_files"] = len(exec_res["near_duplicates"])
+            stats["near_duplicate_bytes_saved"] = exec_res["bytes_saved"]
 
 class IdentifyAbstractions(Node):
     def prep(self, shared):
         files_data = shared["files"]
+        catalog = shared.get("file_catalog") or FileCatalog.build(files_data)
+        near_duplicates = shared.get("near_duplicates") or {}
+        paths = files_data.paths
         project_name = shared["project_name"]  # Get project name
         
         # Helper to create context from files, respecting limits (basic example)
         def create_llm_context(files_data):
-            context = ""
-            file_info = [] # Store tuples of (index, path)
-            for i, (path, content) in enumerate(files_data):
-                entry = f"--- File Index {i}: {path} ---\n{content}\n\n"
-                context += entry
-                file_info.append((i, path))
+            # UTF-8 context, decoded once at the end; each body view is copied in and
+            # released right away, so at most one stored body is mapped at a time
+            context = bytearray()
+            file_info = [] # Store tuples of (index, path, index of the identical file shown)
+            # Identical files are shown once, under a header naming every copy
+            for i, copies in group_duplicates(catalog, range(len(files_data))):
+                path = paths[i]
+                header = f"--- File Index {i}: {path}"
+                if copies:
+                    header += " (identical: " + ", ".join(f"{j}: {paths[j]}" for j in copies) + ")"
+                # Near-copies are shown as a diff against their cluster's representative
+                near = near_duplicates.get(i)
+                if near:
+                    header += f" (diff against File Index {near['representative']})"
+                    body = near["diff"].encode("utf-8")
+                else:
+                    body = files_data.view(i)
+                context += (header + " ---\n").encode("utf-8")
+                context += body
+                context += b"\n\n"
+                del body
+                file_info.append((i, path, None))
+                file_info.extend((j, paths[j], i) for j in copies)
 
-            return context, file_info # file_info is list of (index, path)
+            return context.decode("utf-8"), sorted(file_info) # file_info is list of (index, path, same_as)
 
         context, file_info = create_llm_context(files_data)
         # Format file info for the prompt (comment is just a hint for LLM)
-        file_listing_for_prompt = "\n".join([f"- {idx} # {path}" for idx, path in file_info])
+        file_listing_for_prompt = "\n".join(
+            f"- {idx} # {path}" + (f" (same content as {same_as})" if same_as is not None else "")
+            for idx, path, same_as in file_info
+        )
         return context, file_listing_for_prompt, len(files_data), project_name  # Return project name
 
     def exec(self, prep_res):
@@ -210,7 +405,9 @@ class AnalyzeRelationships(Node):
         # Get content for relevant files using helper
         relevant_files_content_map = get_content_for_indices(
             files_data,
-            sorted(list(all_relevant_indices))
+            sorted(list(all_relevant_indices)),
+            shared.get("file_catalog"),
+            shared.get("near_duplicates")
         )
         # Format file content for context
         file_context_str = "\n\n".join(
@@ -464,64 +661,24 @@ class ComponentActionDocumentation(Node):
         relationships_data = shared.get("relationships", {})
         output_base_dir = shared.get("output_dir", "output")
 
+        catalog = shared.get("file_catalog") or FileCatalog.build(files_data)
+
         # --- New: Determine base name from input files ---
-        base_name = None
-        if files_data:
-            # Get all base names without extension
-            base_names = [os.path.splitext(os.path.basename(path))[0] for path, _ in files_data]
-            # If all base names are the same, use that; else use the first one
-            if len(set(base_names)) == 1:
-                base_name = base_names[0]
-            else:
-                # Look for common patterns like numbers in filenames that identify a component
-                # Find any numeric patterns in filenames (e.g. "1455.aspx", "1455.js" -> "1455")
-                number_patterns = []
-                for path, _ in files_data:
-                    filename = os.path.basename(path)
-                    number_matches = re.findall(r'\d+', filename)
-                    number_patterns.extend(number_matches)
-                
-                # Use the most common number pattern as the folder name if found
-                if number_patterns:
-                    from collections import Counter
-                    most_common = Counter(number_patterns).most_common(1)
-                    if most_common:
-                        base_name = most_common[0][0]
-                    else:
-                        # Fallback to common prefix if no numbers found
-                        base_name = os.path.commonprefix(base_names).rstrip('_-.') or base_names[0]
-                else:
-                    # Optionally, find common prefix
-                    base_name = os.path.commonprefix(base_names).rstrip('_-.') or base_names[0]
-        else:
-            base_name = project_name or "QA_Document"
+        # In --since runs, name the output after the changed files rather than their context
+        naming_indices = catalog.indices(paths=shared.get("changed_paths") or []) or None
+        base_name = catalog.component_name(naming_indices) or project_name or "QA_Document"
 
         # Create a dedicated output folder with the base name
         output_path = os.path.join(output_base_dir, base_name)
         
-        # Filter UI and service-related files
-        ui_files = []
-        service_files = []
-        component_files = []
-        
-        for i, (path, content) in enumerate(files_data):
-            file_ext = os.path.splitext(path)[1].lower()
-            filename = os.path.basename(path).lower()
-            
-            # Identify UI files
-            if any(x in path.lower() for x in ['component', 'view', 'page', 'screen', 'ui']):
-                if file_ext in ['.tsx', '.jsx', '.vue', '.svelte', '.razor', '.cshtml', '.aspx', '.html']:
-                    ui_files.append((i, path, content))
-                elif file_ext in ['.ts', '.js', '.cs', '.java']:
-                    component_files.append((i, path, content))
-            
-            # Identify component files
-            elif file_ext in ['.tsx', '.jsx', '.vue', '.svelte']:
-                component_files.append((i, path, content))
-            
-            # Identify service files
-            elif any(x in path.lower() for x in ['service', 'provider', 'store', 'api', 'controller']):
-                service_files.append((i, path, content))
+        # UI, component and service files as classified by the catalog; exec samples
+        # the first five of each, so only those bodies are loaded
+        def files_with_role(role):
+            return [(i,) + files_data[i] for i in catalog.by_role[role][:5]]
+
+        ui_files = files_with_role("ui")
+        service_files = files_with_role("service")
+        component_files = files_with_role("component")
         
         # Get already processed UI elements
         ui_elements = relationships_data.get("ui_elements", [])
@@ -1095,24 +1252,28 @@ class ExtractStoredProcedures(Node):
     
     def prep(self, shared):
         files_data = shared["files"]
+        # In --since runs, only procedures in changed files are extracted
+        changed_paths = shared.get("changed_paths")
+        changed_paths = set(changed_paths) if changed_paths is not None else None
         
-        # Filter for SQL files containing stored procedures
-        sql_file_indices = []
-        for i, (path, content) in enumerate(files_data):
-            # Check if it's a SQL file or might contain stored procedures
-            if path.lower().endswith('.sql') or 'proc' in path.lower() or 'procedure' in path.lower() or 'sp_' in path.lower():
-                sql_file_indices.append(i)
+        # SQL sources and any file whose path suggests stored procedures
+        catalog = shared.get("file_catalog") or FileCatalog.build(files_data)
+        sql_file_indices = catalog.indices(sql_candidate=True, paths=changed_paths)
         
-        # Create context of all potential SQL files
+        # Map "idx # path" to the index of every potential SQL file; identical scripts
+        # (e.g. one copy per environment) are analyzed once and their copies recorded.
+        # Only metadata is used here: bodies are loaded one at a time in exec
         sql_files_context = {}
-        for idx in sql_file_indices:
-            path, content = files_data[idx]
-            sql_files_context[f"{idx} # {path}"] = content
+        duplicate_paths = {}  # canonical index -> paths of identical copies
+        for idx, copies in group_duplicates(catalog, sql_file_indices):
+            sql_files_context[f"{idx} # {files_data.path(idx)}"] = idx
+            if copies:
+                duplicate_paths[idx] = [files_data.path(j) for j in copies]
             
-        return sql_files_context, files_data, sql_file_indices
+        return sql_files_context, files_data, sql_file_indices, duplicate_paths
     
     def exec(self, prep_res):
-        sql_files_context, files_data, sql_file_indices = prep_res
+        sql_files_context, files_data, sql_file_indices, duplicate_paths = prep_res
         
         if not sql_files_context:
             return {"stored_procedures": [], "message": "No SQL stored procedure files found in the codebase."}
@@ -1121,9 +1282,9 @@ class ExtractStoredProcedures(Node):
         stored_procedures = []
         file_to_procs = {}  # Track procedures per file
         
-        for file_key, content in sql_files_context.items():
-            idx = int(file_key.split('#')[0].strip())
-            path = file_key.split('#')[1].strip()
+        for file_key, idx in sql_files_context.items():
+            path = files_data.path(idx)
+            content = files_data.text(idx)
             
             # Get both the base filename and original path
             filename = os.path.basename(path)
@@ -1233,6 +1394,11 @@ Ensure all multi-line values use proper YAML block syntax with the pipe characte
                 except Exception as fallback_err:
                     print(f"Fallback extraction failed for {path}: {fallback_err}")
         
+        # Procedures found in a file also live in its identical copies
+        for proc in stored_procedures:
+            if proc.get("file_index") in duplicate_paths:
+                proc["duplicate_paths"] = duplicate_paths[proc["file_index"]]
+        
         return {
             "stored_procedures": stored_procedures,
             "count": len(stored_procedures),
@@ -10,46 +10,46 @@ import argparse
 import traceback
 from flow import create_combined_flow
 
-# Import default file patterns from main.py to maintain consistency
-try:
-    from main import DEFAULT_INCLUDE_PATTERNS, DEFAULT_EXCLUDE_PATTERNS
-except ImportError:
-    # Fallback if import fails
-    DEFAULT_INCLUDE_PATTERNS = {
-        "*.py", "*.js", "*.jsx", "*.ts", "*.tsx", "*.go", "*.java", "*.pyi", "*.pyx",
-        "*.c", "*.cc", "*.cpp", "*.h", "*.md", "*.rst", "Dockerfile",
-        "Makefile", "*.yaml", "*.yml", "*.aspx", "*.aspx.cs", "*.aspx.designer.cs", "*.css",
-        "*.sql", "*.proc", "*.stored_procedure"
-    }
-    
-    DEFAULT_EXCLUDE_PATTERNS = {
-        "*test*", "tests/*", "docs/*", "examples/*", "v1/*",
-        "dist/*", "build/*", "experimental/*", "deprecated/*",
-        "legacy/*", ".git/*", ".github/*", ".next/*", ".vscode/*", "obj/*", "bin/*", "node_modules/*", "*.log",
-        "*.jpg", "*.png", "*.xlsx", "*.rdlc", "*.pdf"
-    }
+# Import default file patterns shared with main.py to maintain consistency
+from utils.file_filter import DEFAULT_INCLUDE_PATTERNS, DEFAULT_EXCLUDE_PATTERNS
+from utils.content_store import DEFAULT_CACHE_DIR
+from utils.file_dedup import format_dedup_stats
+from utils.call_llm import cache_stats
 
-def run_agent(input_dir, output_dir, include_patterns=None, exclude_patterns=None, verbose=False):
+def run_agent(input_dir, output_dir, include_patterns=None, exclude_patterns=None, verbose=False,
+              cache_dir=DEFAULT_CACHE_DIR, archive=None, since=None):
     """
-    Run the combined agent on the specified directory.
+    Run the combined agent on the specified directory or archive.
     
     Args:
-        input_dir (str): Directory containing source code to analyze
+        input_dir (str): Directory containing source code to analyze (may be None if archive is given)
         output_dir (str): Directory where output files will be saved
         include_patterns (list, optional): File patterns to include (e.g., ["*.py", "*.sql"])
         exclude_patterns (list, optional): File patterns to exclude (e.g., ["tests/*"])
         verbose (bool, optional): Enable verbose output for debugging
+        cache_dir (str, optional): Directory for crawl caches; None rereads every file
+        archive (str, optional): Zip or tar archive to read instead of input_dir (not extracted)
+        since (str, optional): Git ref; only files changed since it (plus same-stem siblings)
+                               are analyzed. input_dir must be inside a git work tree
     
     Returns:
         dict: Shared data store with results
         
     Raises:
-        FileNotFoundError: If the input directory doesn't exist
+        FileNotFoundError: If the input directory or archive doesn't exist
         Exception: For other errors during processing
     """
-    # Validate input directory exists
-    if not os.path.exists(input_dir):
-        raise FileNotFoundError(f"Input directory not found: {input_dir}")
+    # Validate the input source exists
+    if archive:
+        if not os.path.isfile(archive):
+            raise FileNotFoundError(f"Input archive not found: {archive}")
+        source = archive
+        project_name = None  # FetchRepo derives it from the archive name
+    else:
+        if not input_dir or not os.path.exists(input_dir):
+            raise FileNotFoundError(f"Input directory not found: {input_dir}")
+        source = input_dir
+        project_name = os.path.basename(os.path.abspath(input_dir))  # Derive name from directory
     
     # Default include patterns if not specified
     if include_patterns is None:
@@ -64,9 +64,10 @@ def run_agent(input_dir, output_dir, include_patterns=None, exclude_patterns=Non
     
     # Initialize shared data store
     shared = {
-        "repo_url": None,  # Not using repo URL, only local dir
-        "local_dir": input_dir,
-        "project_name": os.path.basename(os.path.abspath(input_dir)),  # Derive name from directory
+        "repo_url": None,  # Not using repo URL, only local dir or archive
+        "local_dir": None if archive else input_dir,
+        "archive": archive,
+        "project_name": project_name,
         "github_token": None,  # Not needed for local dir
         "output_dir": output_dir,
         
@@ -75,6 +76,8 @@ def run_agent(input_dir, output_dir, include_patterns=None, exclude_patterns=Non
         "exclude_patterns": set(exclude_patterns),
         "max_file_size": 200000,  # 200KB limit
         "verbose": verbose,
+        "cache_dir": cache_dir,
+        "since": since,
         
         # These will be populated by nodes
         "files": [],
@@ -83,7 +86,7 @@ def run_agent(input_dir, output_dir, include_patterns=None, exclude_patterns=Non
     }
     
     # Create and run the combined flow
-    print(f"Starting sequential analysis for: {input_dir}")
+    print(f"Starting sequential analysis for: {source}")
     print(f"Output will be saved to: {output_dir}")
     print(f"Step 1: Creating component action documentation...")
     print(f"Step 2: Generating CSV file with extracted test cases...")
@@ -105,11 +108,15 @@ def run_agent(input_dir, output_dir, include_patterns=None, exclude_patterns=Non
 
 def main():
     parser = argparse.ArgumentParser(description="Run the combined agent from code")
-    parser.add_argument("--input", required=True, help="Input directory with source code")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("--input", help="Input directory with source code")
+    source_group.add_argument("--archive", help="Zip or tar archive with source code (read without extracting)")
     parser.add_argument("--output", default="qa_docs", help="Output directory (default: ./qa_docs)")
     parser.add_argument("--include", nargs="+", help="File patterns to include (e.g., '*.py' '*.sql')")
     parser.add_argument("--exclude", nargs="+", help="File patterns to exclude (e.g., 'tests/*')")
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose output for debugging")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the crawl cache and reread every file")
+    parser.add_argument("--since", help="Only analyze files changed since this git ref (input must be a git work tree)")
     
     args = parser.parse_args()
     
@@ -120,7 +127,10 @@ def main():
             output_dir=args.output,
             include_patterns=args.include,
             exclude_patterns=args.exclude,
-            verbose=args.verbose
+            verbose=args.verbose,
+            cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR,
+            archive=args.archive,
+            since=args.since
         )
         
         # Print summary of results
@@ -140,6 +150,12 @@ def main():
             else:
                 print(f"✅ Step 3: Business logic document: {results['business_logic_document']}")
         
+        if results.get("dedup_stats"):
+            print(f"Dedup savings: {format_dedup_stats(results['dedup_stats'])}")
+        llm_stats = cache_stats()
+        print(f"LLM memory cache: {llm_stats['hits']} hits, {llm_stats['misses']} misses, "
+              f"{llm_stats['evictions']} evictions, {llm_stats['bytes']} bytes held")
+        
         return 0
     except FileNotFoundError as e:
         print(f"Error: {e}")
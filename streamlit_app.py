@@ -6,26 +6,15 @@ import uuid
 import shutil
 from pathlib import Path
 from flow import create_component_action_flow, create_business_logic_flow, create_combined_flow
+from utils.crawl_archive import is_archive
 import time
 import dotenv
 
 # Load environment variables
 dotenv.load_dotenv()
 
-# Default file patterns (match with main.py)
-DEFAULT_INCLUDE_PATTERNS = {
-    "*.py", "*.js", "*.jsx", "*.ts", "*.tsx", "*.go", "*.java", "*.pyi", "*.pyx",
-    "*.c", "*.cc", "*.cpp", "*.h", "*.md", "*.rst", "Dockerfile",
-    "Makefile", "*.yaml", "*.yml", "*.aspx", "*.aspx.cs", "*.aspx.designer.cs", "*.css",
-    "*.sql", "*.proc", "*.stored_procedure"
-}
-
-DEFAULT_EXCLUDE_PATTERNS = {
-    "*test*", "tests/*", "docs/*", "examples/*", "v1/*",
-    "dist/*", "build/*", "experimental/*", "deprecated/*",
-    "legacy/*", ".git/*", ".github/*", ".next/*", ".vscode/*", "obj/*", "bin/*", "node_modules/*", "*.log",
-    "*.jpg", "*.png", "*.xlsx", "*.rdlc", "*.pdf"
-}
+# Default file patterns (shared with main.py)
+from utils.file_filter import DEFAULT_INCLUDE_PATTERNS, DEFAULT_EXCLUDE_PATTERNS
 
 # Function to get appropriate file icon
 def get_file_icon(filename):
@@ -103,9 +92,12 @@ def process_files(files, project_name):
     temp_dir = Path(tempfile.mkdtemp())
     
     try:
-        # Save uploaded files to temporary directory
+        # Archives are read in memory member by member; only loose files are saved to disk
+        archives = [f for f in files if is_archive(f.name)]
         file_paths = []
         for uploaded_file in files:
+            if is_archive(uploaded_file.name):
+                continue
             file_path = temp_dir / uploaded_file.name
             with open(file_path, "wb") as f:
                 f.write(uploaded_file.getbuffer())
@@ -118,7 +110,8 @@ def process_files(files, project_name):
         # Initialize shared store
         shared = {
             "repo_url": None,
-            "local_dir": str(temp_dir),
+            "local_dir": str(temp_dir) if file_paths else None,
+            "archive": archives,
             "project_name": project_name or "Uploaded Project",  # Default name if none provided
             "github_token": None,
             "output_dir": str(output_dir),
@@ -403,9 +396,9 @@ with tab1:
         st.subheader("📤 Upload Files")
         
         uploaded_files = st.file_uploader(
-            "Upload one or more files to analyze", 
+            "Upload one or more files (or a zip of the whole project) to analyze", 
             accept_multiple_files=True,
-            type=["py", "js", "jsx", "ts", "tsx", "html", "css", "cs", "java", "aspx", "yml", "yaml", "sql"],
+            type=["py", "js", "jsx", "ts", "tsx", "html", "css", "cs", "java", "aspx", "yml", "yaml", "sql", "zip"],
             key="file_uploader"
         )
         
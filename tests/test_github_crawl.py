@@ -0,0 +1,218 @@
+"""
+GitHub crawler tests against a local stand-in for the API, raw and codeload hosts.
+
+Run from the repository root with: python -m pytest tests  (or python -m unittest tests.test_github_crawl)
+"""
+
+import io
+import os
+import json
+import base64
+import tarfile
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from urllib.parse import urlparse, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import crawl_github_files
+from utils.blob_store import git_blob_sha
+
+OWNER, REPO = "octo", "app"
+COMMIT_1 = "1" * 40
+COMMIT_2 = "2" * 40
+
+SNAPSHOT_1 = {
+    "src/app.py": b"print('hello')\n",
+    "src/util.py": b"def add(a, b):\n    return a + b\n",
+    "src/big.py": b"x = 1\n" * 100,
+    "src/blob.py": b"\x00\x01\x02binary",
+    "assets/logo.png": b"\x89PNG fake",
+    "docs/guide.md": b"# Guide\n",
+    "README.md": b"# App\n",
+}
+SNAPSHOT_2 = dict(SNAPSHOT_1, **{"src/app.py": b"print('moved')\n"})
+
+INCLUDE = {"*.py", "*.md"}
+EXCLUDE = {"docs/*"}
+MAX_SIZE = 200
+EXPECTED = {"src/app.py", "src/util.py", "README.md"}
+
+class FakeGitHub:
+    """Serves two commits of one repository; the branch "main" points at one of them"""
+
+    def __init__(self):
+        self.snapshots = {COMMIT_1: SNAPSHOT_1, COMMIT_2: SNAPSHOT_2}
+        self.branches = {"main": COMMIT_1}
+        self.requests = []
+        # Called after the tree is listed (e.g. to move the branch mid-crawl)
+        self.on_tree = None
+        # Paths whose raw download returns a wrong body
+        self.corrupt_raw = set()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests.append(self.path)
+                fake.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot(self, ref):
+        commit = self.branches.get(ref, ref)
+        return commit, self.snapshots.get(commit)
+
+    def handle(self, request):
+        path = unquote(urlparse(request.path).path)
+        repo_api = f"/api/repos/{OWNER}/{REPO}"
+        if path == repo_api:
+            return self.send_json(request, {"default_branch": "main"})
+        if path.startswith(repo_api + "/commits/"):
+            commit, files = self.snapshot(path[len(repo_api + "/commits/"):])
+            return self.send_json(request, {"sha": commit}) if files else self.send(request, 404)
+        if path.startswith(repo_api + "/git/trees/"):
+            commit, files = self.snapshot(path[len(repo_api + "/git/trees/"):])
+            if files is None:
+                return self.send(request, 404)
+            etag = f'"{commit}"'
+            if request.headers.get("If-None-Match") == etag:
+                self.send(request, 304, headers={"ETag": etag})
+            else:
+                tree = [{"path": p, "type": "blob", "sha": git_blob_sha(body), "size": len(body)}
+                        for p, body in sorted(files.items())]
+                self.send_json(request, {"sha": "tree-" + commit, "tree": tree, "truncated": False},
+                               headers={"ETag": etag})
+            if self.on_tree is not None:
+                self.on_tree()
+            return
+        if path.startswith(repo_api + "/git/blobs/"):
+            sha = path[len(repo_api + "/git/blobs/"):]
+            for files in self.snapshots.values():
+                for body in files.values():
+                    if git_blob_sha(body) == sha:
+                        return self.send_json(request, {"encoding": "base64",
+                                                        "content": base64.b64encode(body).decode()})
+            return self.send(request, 404)
+        raw_prefix = f"/raw/{OWNER}/{REPO}/"
+        if path.startswith(raw_prefix):
+            rest = path[len(raw_prefix):]
+            # Refs may contain '/', so try the longest known ref first
+            for ref in sorted(list(self.branches) + list(self.snapshots), key=len, reverse=True):
+                if rest.startswith(ref + "/"):
+                    file_path = rest[len(ref) + 1:]
+                    _, files = self.snapshot(ref)
+                    if file_path in files:
+                        body = b"corrupted\n" if file_path in self.corrupt_raw else files[file_path]
+                        return self.send(request, 200, body)
+            return self.send(request, 404)
+        codeload_prefix = f"/codeload/{OWNER}/{REPO}/tar.gz/"
+        if path.startswith(codeload_prefix):
+            commit, files = self.snapshot(path[len(codeload_prefix):])
+            if files is None:
+                return self.send(request, 404)
+            return self.send(request, 200, self.tarball(commit, files))
+        self.send(request, 404)
+
+    @staticmethod
+    def tarball(commit, files):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tf:
+            for path, body in sorted(files.items()):
+                info = tarfile.TarInfo(f"{REPO}-{commit[:7]}/{path}")
+                info.size = len(body)
+                tf.addfile(info, io.BytesIO(body))
+        return buffer.getvalue()
+
+    @staticmethod
+    def send(request, status, body=b"", headers=None):
+        request.send_response(status)
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def send_json(self, request, data, headers=None):
+        self.send(request, 200, json.dumps(data).encode("utf-8"),
+                  dict(headers or {}, **{"Content-Type": "application/json"}))
+
+class GitHubCrawlTest(unittest.TestCase):
+    def setUp(self):
+        self.github = FakeGitHub()
+        self.addCleanup(self.github.close)
+        for name, suffix in (("GITHUB_API_URL", "/api"), ("GITHUB_RAW_URL", "/raw"),
+                             ("GITHUB_CODELOAD_URL", "/codeload")):
+            patcher = mock.patch.object(crawl_github_files, name, self.github.url + suffix)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(os.environ, {"GITHUB_TOKENS": ""})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache_dir = tempfile.mkdtemp()
+
+    def crawl(self, mode="api", cache_dir=None, ref=None):
+        stats = {}
+        files = dict(crawl_github_files.iter_github_files(
+            f"https://github.com/{OWNER}/{REPO}", max_file_size=MAX_SIZE,
+            include_patterns=INCLUDE, exclude_patterns=EXCLUDE, stats=stats,
+            max_workers=2, mode=mode, cache_dir=cache_dir, ref=ref))
+        return files, stats
+
+    def raw_requests(self):
+        return [p for p in self.github.requests if p.startswith("/raw/")]
+
+    def assert_selected(self, files, stats):
+        self.assertEqual(set(files), EXPECTED)
+        self.assertEqual(files["src/app.py"], "print('hello')\n")
+        skips = stats["skip_counts"]
+        self.assertEqual(skips.get("pattern"), 2)  # docs/guide.md excluded, assets/logo.png not included
+        self.assertEqual(skips.get("size"), 1)     # src/big.py
+        self.assertEqual(skips.get("binary"), 1)   # src/blob.py, by content
+
+    def test_api_mode_selects_files(self):
+        files, stats = self.crawl()
+        self.assert_selected(files, stats)
+        self.assertEqual(stats["commit"], COMMIT_1)
+        # Filtered-out files are never downloaded
+        self.assertFalse(any("docs/" in p or "big.py" in p or "logo.png" in p for p in self.raw_requests()))
+
+    def test_tarball_mode_selects_files(self):
+        files, stats = self.crawl(mode="tarball")
+        self.assert_selected(files, stats)
+        self.assertEqual(stats["source"], "tarball")
+
+    def test_second_run_replays_304_and_reuses_blobs(self):
+        first, _ = self.crawl(cache_dir=self.cache_dir)
+        downloads = len(self.raw_requests())
+        second, stats = self.crawl(cache_dir=self.cache_dir)
+        self.assertEqual(first, second)
+        self.assertGreaterEqual(stats["http_cache"]["hits"], 1)
+        self.assertEqual(stats["blob_store"]["hits"], len(EXPECTED) + 1)  # src/blob.py is stored, then skipped
+        self.assertEqual(len(self.raw_requests()), downloads)
+
+    def test_downloads_are_pinned_to_the_listed_commit(self):
+        def move_branch():
+            self.github.branches["main"] = COMMIT_2
+        self.github.on_tree = move_branch
+        files, stats = self.crawl()
+        self.assertEqual(files["src/app.py"], "print('hello')\n")
+        self.assertTrue(all(f"/{COMMIT_1}/" in p for p in self.raw_requests()))
+
+    def test_mismatched_raw_body_falls_back_to_blob_api(self):
+        self.github.corrupt_raw.add("src/util.py")
+        files, _ = self.crawl(cache_dir=self.cache_dir)
+        self.assertEqual(files["src/util.py"], SNAPSHOT_1["src/util.py"].decode("utf-8"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import hashlib
+import threading
+from utils.content_store import ContentStore
+
+# Size bound of the blob store; least recently used blobs are evicted past it
+DEFAULT_BLOB_CACHE_BYTES = int(os.getenv("QA_DOC_BLOB_CACHE_MB", "512")) * 1024 * 1024
+
+def git_blob_sha(data):
+    """Return the git object id of a blob (SHA-1 over 'blob <size>\\0' + data)"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class BlobStore(ContentStore):
+    """
+    Content-addressed store of file bodies keyed by git blob SHA.
+
+    The Trees API reports the blob SHA of every file, so a body downloaded for
+    one ref is reused by every later crawl of any ref that contains the same
+    blob. Reads refresh a blob's mtime, which serves as its LRU timestamp;
+    prune() evicts the least recently used blobs once the store exceeds
+    max_bytes.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_BLOB_CACHE_BYTES):
+        super().__init__(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Read a blob and mark it as recently used.
+
+        Returns:
+            bytes or None: The blob content, or None if it is not stored
+        """
+        data = super().get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.bytes_saved += len(data)
+        try:
+            os.utime(self.path_for(key))
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """Store a blob, ignoring bodies whose content does not match the SHA"""
+        if git_blob_sha(data) != key:
+            return
+        super().put(key, data)
+
+    def prune(self):
+        """
+        Evict least recently used blobs until the store fits in max_bytes.
+
+        Returns:
+            int: Number of blobs evicted
+        """
+        evicted = super().prune(self.max_bytes)
+        with self._lock:
+            self.evicted += evicted
+        return evicted
+
+    def stats(self):
+        """Return the hit/miss, bytes-saved and eviction counters"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+            "evicted": self.evicted,
+        }
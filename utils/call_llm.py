@@ -1,8 +1,14 @@
-from google import genai
 import os
+import asyncio
+import weakref
 import logging
-import json
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
+from utils.llm_clients import get_client, get_async_client, aclose_async_clients
+from utils.llm_cache import LLMCache, MemoryCache, cache_key, prompt_key, DEFAULT_PROMPT_VERSION
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
@@ -21,31 +27,60 @@ file_handler = logging.FileHandler(log_file)
 file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 logger.addHandler(file_handler)
 
-# Simple cache configuration
-cache_file = "llm_cache.json"
+# Model used when GEMINI_MODEL is not set
+DEFAULT_MODEL = "gemini-2.5-pro-exp-03-25"
 
-# By default, we Google Gemini 2.5 pro, as it shows great performance for code understanding
-def call_llm(prompt: str, use_cache: bool = True) -> str:
-    # Log the prompt
-    logger.info(f"PROMPT: {prompt}")
-    
-    # Check cache if enabled
-    if use_cache:
-        # Load cache from disk
-        cache = {}
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r') as f:
-                    cache = json.load(f)
-            except:
-                logger.warning(f"Failed to load cache, starting with empty cache")
-        
-        # Return from cache if exists
-        if prompt in cache:
-            logger.info(f"RESPONSE: {cache[prompt]}")
-            return cache[prompt]
-    
-    # Call the LLM if not in cache or cache disabled
+# Persistent response cache (SQLite); entries of the old JSON cache are imported once
+cache_file = os.getenv("LLM_CACHE_DB", "llm_cache.db")
+legacy_cache_file = "llm_cache.json"
+_cache = None
+_cache_lock = threading.Lock()
+# In-process LRU in front of it (LLM_MEMORY_CACHE_MB, LLM_MEMORY_CACHE_MAX_ENTRY_MB)
+memory_cache = MemoryCache()
+
+# Provider calls in flight at once in the whole process (every thread, event loop and
+# Streamlit session), and the per-call timeout of acall_llm
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "600")) or None
+_provider_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_semaphores = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+_semaphores_lock = threading.Lock()
+
+def get_cache():
+    """Return the process-wide LLM response cache, opening it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(cache_file, legacy_json=legacy_cache_file,
+                              legacy_model=os.getenv("GEMINI_MODEL", DEFAULT_MODEL))
+        return _cache
+
+def cache_stats():
+    """Return the counters of the in-process cache tier"""
+    return memory_cache.stats()
+
+def _lookup(key):
+    """Return a cached response from the memory tier, then the persistent cache, or None"""
+    cached = memory_cache.get(key)
+    if cached is None:
+        cached = get_cache().get(key)
+        if cached is not None:
+            memory_cache.put(key, cached)
+    return cached
+
+def _store(key, response_text, model, latency_ms, response):
+    """Save a fresh response in both cache tiers"""
+    memory_cache.put(key, response_text)
+    usage = getattr(response, "usage_metadata", None)
+    try:
+        get_cache().put(key, response_text, model=model, latency_ms=latency_ms,
+                        prompt_tokens=getattr(usage, "prompt_token_count", None),
+                        response_tokens=getattr(usage, "candidates_token_count", None))
+    except sqlite3.Error as e:
+        logger.error(f"Failed to save cache: {e}")
+
+def _api_key():
+    """Return the Gemini API key from the environment"""
     # client = genai.Client(
     #     vertexai=True, 
     #     # TODO: change to your own project id and location
@@ -56,15 +91,36 @@ def call_llm(prompt: str, use_cache: bool = True) -> str:
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise ValueError("GEMINI_API_KEY not found in environment variables. Make sure it's set in the .env file.")
+    return api_key
+
+# By default, we Google Gemini 2.5 pro, as it shows great performance for code understanding
+def call_llm(prompt: str, use_cache: bool = True, generation_config: dict = None,
+             prompt_version: str = DEFAULT_PROMPT_VERSION) -> str:
+    # Log the prompt
+    logger.info(f"PROMPT: {prompt}")
     
-    client = genai.Client(
-        api_key=api_key,
-    )
-    model = os.getenv("GEMINI_MODEL", "gemini-2.5-pro-exp-03-25")
-    response = client.models.generate_content(
-        model=model,
-        contents=[prompt]
-    )
+    model = os.getenv("GEMINI_MODEL", DEFAULT_MODEL)
+    # The key covers the model, config and template version, not just the prompt
+    key = cache_key(prompt_key(prompt), model, generation_config, prompt_version)
+    
+    # Check cache if enabled
+    if use_cache:
+        cached = _lookup(key)
+        if cached is not None:
+            logger.info(f"RESPONSE: {cached}")
+            return cached
+    
+    # One client per API key for the whole process, reused across calls and threads
+    client = get_client("gemini", api_key=_api_key())
+    # Shares the process-wide LLM_MAX_CONCURRENCY limit with acall_llm
+    with _provider_slots:
+        started = time.perf_counter()
+        response = client.models.generate_content(
+            model=model,
+            contents=[prompt],
+            **({"config": generation_config} if generation_config else {})
+        )
+        latency_ms = (time.perf_counter() - started) * 1000
     response_text = response.text
     
     # Log the response
@@ -72,25 +128,107 @@ def call_llm(prompt: str, use_cache: bool = True) -> str:
     
     # Update cache if enabled
     if use_cache:
-        # Load cache again to avoid overwrites
-        cache = {}
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r') as f:
-                    cache = json.load(f)
-            except:
-                pass
-        
-        # Add to cache and save
-        cache[prompt] = response_text
+        _store(key, response_text, model, latency_ms, response)
+    
+    return response_text
+
+def _semaphore():
+    """Return the concurrency limiter of the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _semaphores_lock:
+        semaphore = _semaphores.get(loop)
+        if semaphore is None:
+            semaphore = _semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        return semaphore
+
+def _release_if_acquired(acquire):
+    """Give back a slot that a cancelled waiter's thread acquired after all"""
+    if not acquire.cancelled() and acquire.exception() is None:
+        _provider_slots.release()
+
+@asynccontextmanager
+async def _provider_slot():
+    """
+    Hold one of the process-wide provider call slots without blocking the event loop.
+
+    The loop's own semaphore bounds how many of its tasks wait in worker
+    threads for a slot, so waiting never exhausts the default executor.
+    """
+    async with _semaphore():
+        acquire = asyncio.ensure_future(asyncio.to_thread(_provider_slots.acquire))
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            acquire.add_done_callback(_release_if_acquired)
+            raise
         try:
-            with open(cache_file, 'w') as f:
-                json.dump(cache, f)
-        except Exception as e:
-            logger.error(f"Failed to save cache: {e}")
+            yield
+        finally:
+            _provider_slots.release()
+
+async def acall_llm(prompt: str, use_cache: bool = True, generation_config: dict = None,
+                    prompt_version: str = DEFAULT_PROMPT_VERSION, timeout: float = LLM_TIMEOUT) -> str:
+    """
+    Async counterpart of call_llm with the same cache keys and tiers.
+
+    At most LLM_MAX_CONCURRENCY provider calls run at once in the process,
+    counting call_llm calls from other threads and other event loops;
+    cache hits do not wait for a slot. Each provider call is cancelled after
+    timeout seconds (asyncio.TimeoutError); None disables the timeout.
+    """
+    logger.info(f"PROMPT: {prompt}")
+    
+    model = os.getenv("GEMINI_MODEL", DEFAULT_MODEL)
+    key = cache_key(prompt_key(prompt), model, generation_config, prompt_version)
+    
+    if use_cache:
+        # The persistent cache is SQLite; keep its I/O off the event loop
+        cached = await asyncio.to_thread(_lookup, key)
+        if cached is not None:
+            logger.info(f"RESPONSE: {cached}")
+            return cached
+    
+    client = get_async_client("gemini", api_key=_api_key())
+    async with _provider_slot():
+        started = time.perf_counter()
+        response = await asyncio.wait_for(client.models.generate_content(
+            model=model,
+            contents=[prompt],
+            **({"config": generation_config} if generation_config else {})
+        ), timeout)
+        latency_ms = (time.perf_counter() - started) * 1000
+    response_text = response.text
+    
+    logger.info(f"RESPONSE: {response_text}")
+    
+    if use_cache:
+        await asyncio.to_thread(_store, key, response_text, model, latency_ms, response)
     
     return response_text
 
+def call_llm_batch(prompts, return_exceptions: bool = False, **kwargs) -> list:
+    """
+    Answer several prompts concurrently from synchronous code.
+
+    Runs acall_llm for every prompt on a fresh event loop (bounded by
+    LLM_MAX_CONCURRENCY), waits for all of them, then closes the loop's
+    async clients.
+
+    Args:
+        prompts (iterable): Prompt strings
+        return_exceptions (bool): Return failures in place of responses instead of raising
+        **kwargs: Passed to acall_llm (use_cache, generation_config, prompt_version, timeout)
+
+    Returns:
+        list: Responses in prompt order
+    """
+    async def run():
+        try:
+            return await asyncio.gather(*(acall_llm(p, **kwargs) for p in prompts),
+                                        return_exceptions=return_exceptions)
+        finally:
+            await aclose_async_clients()
+    return asyncio.run(run())
 
 # def call_llm(prompt, use_cache: bool = True):
 #     from anthropic import Anthropic
@@ -0,0 +1,110 @@
+import os
+import git
+from urllib.parse import quote
+from utils.file_filter import normalize_path
+
+# The compare API returns at most this many files per page
+COMPARE_PAGE_SIZE = 100
+COMPARE_MAX_PAGES = 30
+
+def _parse_name_status(output):
+    """
+    Split `--name-status -z --no-renames` output into changed and deleted paths.
+
+    Returns:
+        dict: {"changed": [...], "deleted": [...]}
+    """
+    tokens = output.split("\0")
+    changed, deleted = [], []
+    for status, path in zip(tokens[0::2], tokens[1::2]):
+        if not path:
+            continue
+        (deleted if status.startswith("D") else changed).append(path)
+    return {"changed": sorted(changed), "deleted": sorted(deleted)}
+
+def in_frame(paths, base_path, relative):
+    """
+    Map repository-root paths into a crawl's path frame.
+
+    Keeps only paths below base_path and strips it when the crawl uses
+    paths relative to it.
+    """
+    base_path = normalize_path(base_path or "").strip("/")
+    result = []
+    for path in paths:
+        if base_path:
+            if not path.startswith(base_path + "/"):
+                continue
+            if relative:
+                path = path[len(base_path) + 1:]
+        result.append(path)
+    return result
+
+def local_changes(directory, since):
+    """
+    List files under a local directory that differ from the commit since.
+
+    Compares since with the working tree (committed, staged and unstaged
+    edits) and adds untracked files that are not ignored.
+
+    Args:
+        directory (str): Directory inside a git work tree
+        since (str): Any revision git understands (branch, tag, sha, HEAD~3, ...)
+
+    Returns:
+        dict: {"changed": [...], "deleted": [...]} with paths relative to directory
+    """
+    repo = git.Repo(directory, search_parent_directories=True)
+    try:
+        prefix = os.path.relpath(os.path.abspath(directory), repo.working_tree_dir)
+        prefix = "" if prefix == "." else normalize_path(prefix)
+        diff_args = ["--name-status", "-z", "--no-renames"]
+        if prefix:
+            diff_args.append(f"--relative={prefix}/")
+        changes = _parse_name_status(repo.git.diff(*diff_args, since, "--", prefix or "."))
+        untracked = repo.git.ls_files("--others", "--exclude-standard", "-z", "--", prefix or ".").split("\0")
+        changes["changed"] = sorted(set(changes["changed"]) | set(in_frame(filter(None, untracked), prefix, True)))
+        return changes
+    finally:
+        repo.close()
+
+def tree_changes(repo, base_commit, commit, subdir=""):
+    """
+    Compare two commits of a (possibly bare, shallow or partial) repository.
+
+    Only trees are compared, so no blob is fetched.
+
+    Returns:
+        dict: {"changed": [...], "deleted": [...]} with repository-root paths
+    """
+    args = ["-r", "--name-status", "-z", "--no-renames", base_commit, commit]
+    if subdir:
+        args += ["--", subdir]
+    return _parse_name_status(repo.git.diff_tree(*args))
+
+def compare_changes(session, api_url, owner, repo, base, head):
+    """
+    List files changed between two refs with the GitHub compare API.
+
+    Returns:
+        dict or None: {"changed": [...], "deleted": [...]} with repository-root
+                      paths, or None if the comparison failed
+    """
+    url = f"{api_url}/repos/{owner}/{repo}/compare/{quote(base, safe='')}...{quote(head, safe='')}"
+    changed, deleted = set(), set()
+    for page in range(1, COMPARE_MAX_PAGES + 1):
+        response = session.get(url, params={"per_page": COMPARE_PAGE_SIZE, "page": page})
+        if response.status_code != 200:
+            print(f"Error comparing {base}...{head}: {response.status_code} - {response.text}")
+            return None
+        files = response.json().get("files", [])
+        for entry in files:
+            if entry.get("status") == "removed":
+                deleted.add(entry["filename"])
+            else:
+                changed.add(entry["filename"])
+            if entry.get("previous_filename"):
+                deleted.add(entry["previous_filename"])
+        if len(files) < COMPARE_PAGE_SIZE:
+            break
+    return {"changed": sorted(changed), "deleted": sorted(deleted - changed)}
@@ -0,0 +1,193 @@
+import os
+import mmap
+import uuid
+import hashlib
+import tempfile
+from utils.file_lock import FileLock
+
+# Root directory for on-disk crawl caches (manifests, content store)
+DEFAULT_CACHE_DIR = os.getenv("QA_DOC_CACHE_DIR", ".qa_doc_cache")
+# Size bound of the crawled-body store; least recently used bodies are evicted past it
+DEFAULT_OBJECT_CACHE_BYTES = int(os.getenv("QA_DOC_OBJECT_CACHE_MB", "1024")) * 1024 * 1024
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of bytes or str content"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+class ContentStore:
+    """
+    Content-addressed store that keeps one file per key under root.
+
+    Keys are hex digests; bodies are laid out as <root>/<key[:2]>/<key[2:]> so
+    no single directory grows too large. Writes are atomic (temp file + rename),
+    which makes the store safe to share between threads and processes.
+
+    A run that reads bodies lazily holds a lease (a locked file under
+    <root>/.leases) while it may still read them; prune() evicts nothing
+    while another run's lease is alive.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, key):
+        """Return the on-disk location of a key"""
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def has(self, key):
+        return os.path.exists(self.path_for(key))
+
+    def get(self, key):
+        """
+        Read a stored body.
+
+        Returns:
+            bytes or None: The stored bytes, or None if the key is missing
+        """
+        try:
+            with open(self.path_for(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def map(self, key):
+        """
+        Memory-map a stored body for reading.
+
+        The mapping stays open while the returned view (or any slice of it) is
+        referenced, and is released with it.
+
+        Returns:
+            memoryview or None: Read-only view of the bytes, or None if the key is missing
+        """
+        try:
+            with open(self.path_for(key), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return memoryview(b"")
+                return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        """Store bytes under key (no-op if the key is already present)"""
+        path = self.path_for(key)
+        if os.path.exists(path):
+            # Mark the body as recently used so prune() keeps it
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def lease(self):
+        """
+        Register a run that may read bodies from the store until it releases the lease.
+
+        The lease is released by calling its release() method, or when it is
+        garbage collected or its process exits.
+
+        Returns:
+            FileLock: The held lease
+        """
+        path = os.path.join(self.root, ".leases", f"{os.getpid()}-{uuid.uuid4().hex}")
+        # Taken under the store lock, so a prune in progress finishes first
+        with FileLock(os.path.join(self.root, ".lock")):
+            lease = FileLock(path)
+            lease.acquire()
+        return lease
+
+    def _other_runs_active(self, own_lease=None):
+        """Return True if a lease other than own_lease is held; stale leases are removed"""
+        lease_dir = os.path.join(self.root, ".leases")
+        try:
+            names = os.listdir(lease_dir)
+        except OSError:
+            return False
+        own_path = own_lease.path if own_lease is not None else None
+        active = False
+        for name in names:
+            path = os.path.join(lease_dir, name)
+            if path == own_path:
+                continue
+            probe = FileLock(path)
+            if not probe.acquire(blocking=False):
+                active = True
+                continue
+            # Its holder is gone
+            probe.release()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return active
+
+    def _entries(self):
+        """List (mtime, size, path) for every stored body"""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            # Skip the lease directory
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for name in filenames:
+                # Skip temp files and the lock file
+                if name.startswith("."):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def prune(self, max_bytes, keep=(), lease=None):
+        """
+        Evict least recently written or used bodies until the store fits in max_bytes.
+
+        Nothing is evicted while a run other than the caller holds a lease;
+        the bound is then enforced by a later prune.
+
+        Args:
+            max_bytes (int): Size bound; 0 or None disables pruning
+            keep (iterable): Keys that must not be evicted (e.g. bodies in use)
+            lease (FileLock, optional): The caller's own lease, if it holds one
+
+        Returns:
+            int: Number of bodies evicted
+        """
+        if not max_bytes:
+            return 0
+        with FileLock(os.path.join(self.root, ".lock")):
+            if self._other_runs_active(lease):
+                return 0
+            return self._evict(max_bytes, {self.path_for(key) for key in keep})
+
+    def _evict(self, max_bytes, keep_paths):
+        """Remove the oldest bodies not in keep_paths until the store fits in max_bytes"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            if path in keep_paths:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        return evicted
@@ -0,0 +1,235 @@
+from array import array
+import numpy as np
+from utils.content_store import content_hash
+
+class Corpus:
+    """
+    Immutable collection of crawled files backed by one contiguous UTF-8 buffer.
+
+    Paths are kept in a list; bodies live back to back in a single read-only
+    buffer, located by NumPy start/end offset arrays. Files with identical
+    content share one span of the buffer. view(i) is a zero-copy memoryview of
+    a body; corpus[i] decodes it and returns a (path, content) tuple, so code
+    written for a list of tuples (index access, unpacking, iteration, len)
+    keeps working.
+    """
+
+    __slots__ = ("_paths", "_buffer", "_starts", "_ends")
+
+    def __init__(self, paths, buffer, starts, ends):
+        self._paths = list(paths)
+        self._buffer = memoryview(buffer).toreadonly()
+        self._starts = np.asarray(starts, dtype=np.int64)
+        self._ends = np.asarray(ends, dtype=np.int64)
+
+    @classmethod
+    def build(cls, files, keys=None):
+        """
+        Build a corpus from (path, content) tuples.
+
+        Args:
+            files (iterable): (path, content) tuples; content is str or UTF-8 bytes
+            keys (iterable, optional): Content hash per file; files with equal
+                                       keys share one span of the buffer
+        """
+        builder = CorpusBuilder()
+        keys = iter(keys) if keys is not None else None
+        for path, content in files:
+            builder.add(path, content, next(keys) if keys is not None else None)
+        return builder.build()
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._paths[index], self.text(index)
+
+    def __iter__(self):
+        for i in range(len(self._paths)):
+            yield self._paths[i], self.text(i)
+
+    def __reduce__(self):
+        return Corpus, (self._paths, self._buffer.tobytes(), self._starts, self._ends)
+
+    def path(self, index):
+        """Return the path of a file"""
+        return self._paths[index]
+
+    @property
+    def paths(self):
+        """Paths of all files, in index order"""
+        return tuple(self._paths)
+
+    def view(self, index):
+        """Return a zero-copy, read-only memoryview of a file's UTF-8 body"""
+        return self._buffer[self._starts[index]:self._ends[index]]
+
+    def text(self, index):
+        """Return a file's body decoded to str"""
+        return str(self.view(index), "utf-8")
+
+    def size(self, index):
+        """Return the size of a file's body in bytes"""
+        return int(self._ends[index] - self._starts[index])
+
+    @property
+    def nbytes(self):
+        """Size of the shared body buffer"""
+        return self._buffer.nbytes
+
+class FileHandle:
+    """
+    Lightweight reference to a file body held in a content store.
+
+    Only the path, content key and size are kept (and pickled); the body is
+    memory-mapped from the store when it is read.
+    """
+
+    __slots__ = ("path", "key", "size", "store")
+
+    def __init__(self, path, key, size, store):
+        self.path = path
+        self.key = key
+        self.size = size
+        self.store = store
+
+    def view(self):
+        """Return a read-only memoryview of the UTF-8 body, memory-mapped from the store"""
+        data = self.store.map(self.key)
+        if data is None:
+            raise FileNotFoundError(f"Body of {self.path} ({self.key}) is missing from {self.store.root}")
+        return data
+
+    def read(self):
+        """Return the body decoded to str"""
+        return str(self.view(), "utf-8")
+
+class StoredCorpus:
+    """
+    Corpus whose bodies live on disk in a content-addressed store.
+
+    Holds one FileHandle per file and offers the same interface as Corpus.
+    Paths, sizes and keys are in memory; a body is memory-mapped only when
+    view(), text() or index access asks for it. The store lease taken while
+    the corpus was built is held as long as the corpus lives, so concurrent
+    runs do not prune its bodies. Pickling the corpus (e.g. with the shared
+    store) carries only the handles.
+    """
+
+    __slots__ = ("_handles", "lease")
+
+    def __init__(self, handles, lease=None):
+        self._handles = list(handles)
+        self.lease = lease
+
+    def __len__(self):
+        return len(self._handles)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        handle = self._handles[index]
+        return handle.path, handle.read()
+
+    def __iter__(self):
+        for handle in self._handles:
+            yield handle.path, handle.read()
+
+    def __reduce__(self):
+        return StoredCorpus, (self._handles,)
+
+    def handle(self, index):
+        """Return the FileHandle of a file"""
+        return self._handles[index]
+
+    def path(self, index):
+        """Return the path of a file"""
+        return self._handles[index].path
+
+    @property
+    def paths(self):
+        """Paths of all files, in index order"""
+        return tuple(h.path for h in self._handles)
+
+    def view(self, index):
+        """Return a read-only memoryview of a file's UTF-8 body, memory-mapped on demand"""
+        return self._handles[index].view()
+
+    def text(self, index):
+        """Return a file's body decoded to str"""
+        return self._handles[index].read()
+
+    def size(self, index):
+        """Return the size of a file's body in bytes"""
+        return self._handles[index].size
+
+    @property
+    def nbytes(self):
+        """Size of the distinct bodies the corpus refers to"""
+        return sum({h.key: h.size for h in self._handles}.values())
+
+class CorpusBuilder:
+    """
+    Append-only builder of a Corpus; bodies are encoded into the buffer as they arrive.
+
+    Given a content store, bodies are written to the store under their key
+    instead, and build() returns a StoredCorpus of lazy handles that holds a
+    lease on the store (see ContentStore.lease).
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        # Taken before the first write so a concurrent prune cannot evict what is written
+        self._lease = store.lease() if store is not None else None
+        self._handles = []
+        self._paths = []
+        self._buffer = bytearray()
+        self._starts = array("q")
+        self._ends = array("q")
+        self._spans = {}  # content key -> (start, end)
+
+    def __len__(self):
+        return len(self._handles) if self.store is not None else len(self._paths)
+
+    def add(self, path, content, key=None):
+        """
+        Append a file.
+
+        Args:
+            path (str): File path
+            content (str or bytes): File body
+            key (str, optional): Content hash (SHA-256 of the UTF-8 body); a body
+                                 already added under the same key is not stored
+                                 again. Computed when a store is used and no key is given
+
+        Returns:
+            int: Index of the file
+        """
+        if self.store is not None:
+            data = content.encode("utf-8") if isinstance(content, str) else content
+            if key is None:
+                key = content_hash(data)
+            self.store.put(key, data)
+            self._handles.append(FileHandle(path, key, len(data), self.store))
+            return len(self._handles) - 1
+        span = self._spans.get(key) if key is not None else None
+        if span is None:
+            data = content.encode("utf-8") if isinstance(content, str) else content
+            span = (len(self._buffer), len(self._buffer) + len(data))
+            self._buffer += data
+            if key is not None:
+                self._spans[key] = span
+        self._paths.append(path)
+        self._starts.append(span[0])
+        self._ends.append(span[1])
+        return len(self._paths) - 1
+
+    def build(self):
+        """Freeze the files added so far into a Corpus; the builder must not be reused"""
+        if self.store is not None:
+            return StoredCorpus(self._handles, self._lease)
+        return Corpus(self._paths, self._buffer,
+                      np.frombuffer(self._starts, dtype=np.int64).copy(),
+                      np.frombuffer(self._ends, dtype=np.int64).copy())
@@ -0,0 +1,178 @@
+import os
+import tarfile
+import zipfile
+from utils.file_filter import PathFilter, decode_text, normalize_path
+
+# Archive formats accepted as a crawl source
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+def is_archive(filename):
+    """Check whether a file name looks like a supported archive"""
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def archive_name(archive):
+    """Return a display name for an archive given as a path or a file object"""
+    if isinstance(archive, (str, os.PathLike)):
+        return os.path.basename(os.fspath(archive))
+    return os.path.basename(getattr(archive, "name", "") or "archive")
+
+def _member_path(name, strip_components):
+    """Normalize a member name and drop leading path components"""
+    path = normalize_path(name)
+    while path.startswith("./"):
+        path = path[2:]
+    path = path.lstrip("/")
+    if strip_components:
+        parts = path.split("/")
+        if len(parts) <= strip_components:
+            return None
+        path = "/".join(parts[strip_components:])
+    return path or None
+
+def _read_limited(fileobj, limit):
+    """Read at most limit bytes (+1 to detect headers that understate the size)"""
+    if not limit:
+        return fileobj.read()
+    return fileobj.read(limit + 1)
+
+def _select(path, size, path_filter, subdir, skipped_files):
+    """
+    Apply the subdir restriction and the filter to a member.
+
+    Returns:
+        str or None: The path to yield (relative to subdir if given), or None to skip
+    """
+    if path is None:
+        return None
+    if subdir:
+        if not path.startswith(subdir + "/"):
+            return None
+        path = path[len(subdir) + 1:]
+    reason = path_filter.skip_reason(path, size)
+    if reason:
+        path_filter.record_skip(reason)
+        if reason == "size":
+            skipped_files.append((path, size))
+        return None
+    return path
+
+def _iter_zip(archive, path_filter, strip_components, subdir, skipped_files):
+    """Yield (path, opener) for zip members that pass the filter"""
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            # Filter on central-directory metadata before decompressing anything
+            path = _select(_member_path(info.filename, strip_components), info.file_size,
+                           path_filter, subdir, skipped_files)
+            if path is None:
+                continue
+            yield path, lambda info=info: zf.open(info)
+
+def _iter_tar(archive, path_filter, strip_components, subdir, skipped_files):
+    """Yield (path, opener) for tar members that pass the filter, in stream mode"""
+    if isinstance(archive, (str, os.PathLike)):
+        tf = tarfile.open(archive, mode="r|*")
+    else:
+        tf = tarfile.open(fileobj=archive, mode="r|*")
+    with tf:
+        for member in tf:
+            if not member.isfile():
+                continue
+            # Filter on the member header; skipped bodies are never decoded
+            path = _select(_member_path(member.name, strip_components), member.size,
+                           path_filter, subdir, skipped_files)
+            if path is None:
+                continue
+            yield path, lambda member=member: tf.extractfile(member)
+
+def iter_archive_files(archive, include_patterns=None, exclude_patterns=None, max_file_size=None,
+                       strip_components=0, path_filter=None, stats=None, archive_format=None,
+                       subdir=None, prefix=None):
+    """
+    Lazily yield (path, content) records from a zip or tar archive without extracting it.
+
+    Include/exclude/size rules are applied to member metadata before a member is
+    decompressed. Tar archives (optionally gzip/bz2/xz compressed) are read in
+    stream mode, so non-seekable sources such as HTTP responses work too.
+
+    Args:
+        archive (str or file object): Path to the archive, or a binary file object
+                                      (zip sources must be seekable)
+        include_patterns (set): File patterns to include (e.g. {"*.py", "*.js"})
+        exclude_patterns (set): File patterns to exclude (e.g. {"tests/*"})
+        max_file_size (int): Maximum file size in bytes
+        strip_components (int): Number of leading path components to drop from member names
+        path_filter (PathFilter, optional): Prebuilt filter; overrides the pattern/size arguments
+        stats (dict, optional): Filled with "downloaded_count" and "skipped" counters once exhausted
+        archive_format (str, optional): "zip" or "tar"; detected from the content if omitted
+                                        (pass "tar" for non-seekable streams)
+        subdir (str, optional): Only read members below this directory; yielded paths
+                                are relative to it
+        prefix (str, optional): Directory prepended to every yielded path (e.g. the
+                                archive name, to keep paths unique across sources);
+                                filters still see the path inside the archive
+
+    Yields:
+        tuple: (path, content)
+    """
+    if path_filter is None:
+        path_filter = PathFilter(include_patterns, exclude_patterns, max_file_size)
+    name = archive_name(archive)
+
+    if isinstance(archive, (str, os.PathLike)) and not os.path.isfile(archive):
+        raise ValueError(f"Archive does not exist: {archive}")
+
+    if archive_format is None:
+        is_zip = zipfile.is_zipfile(archive)
+        if not isinstance(archive, (str, os.PathLike)):
+            # is_zipfile moves the file position of file objects
+            archive.seek(0)
+    else:
+        is_zip = archive_format == "zip"
+    subdir = normalize_path(subdir).strip("/") if subdir else None
+    skipped_files = []
+    members = _iter_zip(archive, path_filter, strip_components, subdir, skipped_files) if is_zip \
+        else _iter_tar(archive, path_filter, strip_components, subdir, skipped_files)
+
+    print(f"Reading archive: {name}...")
+    count = 0
+    for path, opener in members:
+        try:
+            with opener() as f:
+                data = _read_limited(f, path_filter.max_file_size)
+        except Exception as e:
+            print(f"Warning: Could not read {path} from {name}: {e}")
+            path_filter.record_skip("error")
+            continue
+        if path_filter.too_large(len(data)):
+            path_filter.record_skip("size")
+            skipped_files.append((path, len(data)))
+            continue
+        content = decode_text(data)
+        if content is None:
+            path_filter.record_skip("binary")
+            continue
+        count += 1
+        yield (f"{prefix}/{path}" if prefix else path), content
+
+    print(f"Read {count} files from {name}. {path_filter.summary()}")
+    if stats is not None:
+        stats["downloaded_count"] = stats.get("downloaded_count", 0) + count
+        stats["skipped"] = dict(path_filter.skipped)
+        stats["skipped_files"] = stats.get("skipped_files", []) + skipped_files
+
+def crawl_archive_files(archive, include_patterns=None, exclude_patterns=None, max_file_size=None,
+                        strip_components=0):
+    """
+    Crawl files in a zip or tar archive with similar interface as crawl_local_files.
+
+    Returns:
+        dict: {"files": {path: content}, "stats": {"downloaded_count": int, "skipped": {reason: count}}}
+    """
+    stats = {}
+    files = dict(iter_archive_files(
+        archive, include_patterns, exclude_patterns, max_file_size,
+        strip_components=strip_components, stats=stats
+    ))
+    return {"files": files, "stats": stats}
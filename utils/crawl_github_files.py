@@ -1,23 +1,286 @@
-import requests
 import base64
 import os
-import tempfile
-import git
-import time
-import fnmatch
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union, Set, List, Dict, Tuple, Any
-from urllib.parse import urlparse
+from urllib.parse import urlparse, quote
+from utils.file_filter import PathFilter, decode_text
+from utils.crawl_archive import iter_archive_files
+from utils.github_scheduler import RateLimitScheduler, resolve_tokens
+from utils.http_cache import HttpCache
+from utils.blob_store import BlobStore, git_blob_sha
+from utils.repo_mirror import open_commit
+from utils.change_set import tree_changes, compare_changes, in_frame
 
-def crawl_github_files(
+# GitHub endpoints (override for GitHub Enterprise)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_RAW_URL = os.getenv("GITHUB_RAW_URL", "https://raw.githubusercontent.com")
+GITHUB_CODELOAD_URL = os.getenv("GITHUB_CODELOAD_URL", "https://codeload.github.com")
+
+# Crawl modes for HTTPS URLs
+GITHUB_MODES = ("api", "tarball", "mirror")
+
+# Default number of concurrent blob downloads
+DEFAULT_FETCH_WORKERS = 8
+
+def _iter_tarball(session, owner, repo, ref, specific_path, authenticated, path_filter, stats):
+    """
+    Stream the repository tarball for ref through tarfile and yield accepted members.
+
+    Public repositories are fetched straight from codeload; when authenticated the
+    API tarball endpoint is used so private repositories work too. Members are
+    filtered on their tar headers as the stream goes by: no temp directory and
+    no per-file request.
+    """
+    if authenticated:
+        url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/tarball/{quote(ref, safe='')}"
+    else:
+        url = f"{GITHUB_CODELOAD_URL}/{owner}/{repo}/tar.gz/{quote(ref, safe='')}"
+    
+    print(f"Streaming tarball for {owner}/{repo}@{ref}...")
+    with session.get(url, stream=True) as response:
+        if response.status_code != 200:
+            print(f"Error downloading tarball for {ref}: {response.status_code}")
+            stats["error"] = f"Tarball download failed with status {response.status_code}"
+            return
+        response.raw.decode_content = True
+        # Members are prefixed with a single "<repo>-<sha>/" directory
+        yield from iter_archive_files(
+            response.raw,
+            path_filter=path_filter,
+            strip_components=1,
+            subdir=specific_path or None,
+            archive_format="tar",
+            stats=stats
+        )
+
+def _iter_commit_blobs(repo, commit, subdir, use_relative_paths, path_filter, missing, skipped_files):
+    """
+    Yield (path, content) for accepted blobs of a commit, read from the object database.
+
+    Candidates are listed with ls-tree and filtered by path before any object is
+    touched; sizes come from the persistent `cat-file --batch-check` process and
+    bodies from the persistent `cat-file --batch` process that GitPython keeps
+    per repository. (`ls-tree -l` is avoided: in a partial clone it would
+    lazily fetch every filtered-out blob just to report its size.)
+    """
+    args = ["-r", "-z", commit]
+    if subdir:
+        args += ["--", subdir]
+    for entry in repo.git.ls_tree(*args).split("\0"):
+        if not entry:
+            continue
+        meta, path = entry.split("\t", 1)
+        _, obj_type, sha = meta.split()
+        if obj_type != "blob":
+            # Submodules are commits in another repository
+            continue
+        rel_path = path[len(subdir) + 1:] if (subdir and use_relative_paths) else path
+        
+        # Pattern and binary-extension checks need no object access
+        if not path_filter.check(rel_path):
+            continue
+        if sha in missing:
+            # Left on the server by the blob:limit filter
+            path_filter.record_skip("size")
+            skipped_files.append((rel_path, None))
+            continue
+        size = repo.git.get_object_header(sha)[2]
+        if path_filter.too_large(size):
+            path_filter.record_skip("size")
+            skipped_files.append((rel_path, size))
+            continue
+        
+        content = decode_text(repo.git.get_object_data(sha)[3])
+        if content is None:
+            path_filter.record_skip("binary")
+            continue
+        yield rel_path, content
+
+def _restrict_to_changes(path_filter, changes, base_path, use_relative_paths, stats, filter_relative=None):
+    """
+    Scope the filter to changed paths and report them in the crawl's path frame.
+
+    filter_relative overrides the frame the filter sees (archives always use
+    paths relative to base_path).
+    """
+    if filter_relative is None:
+        filter_relative = use_relative_paths
+    path_filter.restrict(in_frame(changes["changed"], base_path, filter_relative))
+    stats["changed_paths"] = in_frame(changes["changed"], base_path, use_relative_paths)
+    stats["deleted_paths"] = in_frame(changes["deleted"], base_path, use_relative_paths)
+    print(f"{len(stats['changed_paths'])} files changed and {len(stats['deleted_paths'])} deleted.")
+
+def _iter_git_files(clone_url, ref, subdir, use_relative_paths, path_filter, stats, cache_dir=None, env=None,
+                    since=None):
+    """
+    Yield (path, content) for a commit fetched over the git transport.
+
+    The commit is fetched into a persistent mirror when cache_dir is set (or a
+    temp dir otherwise) and read straight from the object database. With
+    since, only files that differ from that ref are read.
+    """
+    subdir = subdir.strip("/") if subdir else ""
+    downloaded_count = 0
+    skipped_files = []
+    try:
+        with open_commit(clone_url, ref, path_filter.max_file_size, cache_dir=cache_dir, env=env,
+                         since=since) as (repo, commit, missing, base):
+            if base:
+                _restrict_to_changes(path_filter, tree_changes(repo, base, commit, subdir),
+                                     subdir, use_relative_paths, stats)
+            # Read blobs straight from the object database; nothing is checked out
+            for rel_path, content in _iter_commit_blobs(repo, commit, subdir, use_relative_paths,
+                                                        path_filter, missing, skipped_files):
+                downloaded_count += 1
+                yield rel_path, content
+    except Exception as e:
+        print(f"Error reading repo {clone_url}: {e}")
+        stats["error"] = str(e)
+        return
+    
+    print(f"Read {downloaded_count} files from clone. {path_filter.summary()}")
+    stats.update({
+        "downloaded_count": downloaded_count,
+        "skipped_count": len(skipped_files),
+        "skipped_files": skipped_files,
+        "base_path": subdir if (use_relative_paths and subdir) else None,
+        "skip_counts": dict(path_filter.skipped),
+        "ref": commit
+    })
+
+def _default_branch(session, owner, repo):
+    """Look up the repository's default branch, falling back to 'main'"""
+    response = session.get(f"{GITHUB_API_URL}/repos/{owner}/{repo}")
+    if response.status_code == 200:
+        return response.json().get("default_branch") or "main"
+    return "main"
+
+def _resolve_commit(session, owner, repo, ref):
+    """
+    Resolve a branch, tag or commit to the SHA of its commit.
+
+    The tree listing and every download then read the same snapshot, even
+    if the branch moves during the crawl.
+
+    Returns:
+        str or None: The commit SHA, or None if the ref could not be resolved
+    """
+    response = session.get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits/{quote(ref, safe='')}")
+    if response.status_code == 200:
+        return response.json().get("sha")
+    return None
+
+def _list_tree(session, owner, repo, ref, specific_path, authenticated):
+    """
+    List every blob below specific_path at ref with the Git Trees API.
+
+    Uses one recursive call; if GitHub truncates the response (very large
+    repositories) the tree is walked one level at a time instead.
+
+    Returns:
+        list or None: [{"path", "sha", "size"}, ...], or None if the tree could not be listed
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/{quote(ref, safe='')}"
+    response = session.get(url, params={"recursive": "1"})
+    
+    if response.status_code == 404:
+        if not authenticated:
+            print(f"Error 404: Repository not found or is private.\n"
+                  f"If this is a private repository, please provide a valid GitHub token via the 'token' argument or set the GITHUB_TOKEN environment variable.")
+        else:
+            print(f"Error 404: Ref '{ref}' not found in repository or insufficient permissions with the provided token.\n"
+                  f"Please verify the token has access to this repository and the ref exists.")
+        return None
+    
+    if response.status_code != 200:
+        print(f"Error listing tree for {ref}: {response.status_code} - {response.text}")
+        return None
+    
+    data = response.json()
+    entries = data.get("tree", [])
+    if data.get("truncated"):
+        print("Tree listing was truncated by GitHub; walking subtrees individually...")
+        entries = []
+        queue = deque([("", data["sha"])])
+        while queue:
+            prefix, tree_sha = queue.popleft()
+            sub = session.get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/{tree_sha}")
+            if sub.status_code != 200:
+                print(f"Error listing tree {prefix or '/'}: {sub.status_code}")
+                continue
+            for entry in sub.json().get("tree", []):
+                entry = dict(entry, path=f"{prefix}{entry['path']}")
+                if entry["type"] == "tree":
+                    # Only descend into subtrees that can contain specific_path
+                    if not specific_path or specific_path.startswith(entry["path"] + "/") \
+                            or entry["path"] == specific_path or entry["path"].startswith(specific_path + "/"):
+                        queue.append((entry["path"] + "/", entry["sha"]))
+                else:
+                    entries.append(entry)
+    
+    blobs = []
+    for entry in entries:
+        if entry.get("type") != "blob":
+            continue
+        path = entry["path"]
+        if specific_path and path != specific_path and not path.startswith(specific_path + "/"):
+            continue
+        blobs.append({"path": path, "sha": entry["sha"], "size": entry.get("size", 0)})
+    return blobs
+
+def _download_blob(session, owner, repo, ref, blob):
+    """
+    Download a blob's raw bytes from raw.githubusercontent.com, falling back to the Git Blobs API.
+
+    ref should be a commit SHA (see _resolve_commit). A body whose git blob
+    SHA differs from the listed one is never returned.
+
+    Returns:
+        bytes or None: The blob content, or None if it could not be downloaded
+    """
+    raw_url = f"{GITHUB_RAW_URL}/{owner}/{repo}/{quote(ref)}/{quote(blob['path'])}"
+    # Bodies are kept (and size-bounded) by the blob store, not the HTTP cache
+    response = session.get(raw_url, use_cache=False)
+    if response.status_code == 200 and git_blob_sha(response.content) == blob["sha"]:
+        return response.content
+    
+    # Alternative method if the raw download is not available
+    blob_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/blobs/{blob['sha']}"
+    response = session.get(blob_url, use_cache=False)
+    if response.status_code == 200:
+        data = response.json()
+        if data.get("encoding") == "base64" and "content" in data:
+            content = base64.b64decode(data["content"])
+            if git_blob_sha(content) == blob["sha"]:
+                return content
+            print(f"Failed to download {blob['path']}: content does not match blob {blob['sha']}")
+            return None
+    print(f"Failed to download {blob['path']}: {response.status_code}")
+    return None
+
+def iter_github_files(
     repo_url, 
     token=None, 
     max_file_size: int = 1 * 1024 * 1024,  # 1 MB
     use_relative_paths: bool = False,
     include_patterns: Union[str, Set[str]] = None,
-    exclude_patterns: Union[str, Set[str]] = None
+    exclude_patterns: Union[str, Set[str]] = None,
+    stats: Dict[str, Any] = None,
+    max_workers: int = DEFAULT_FETCH_WORKERS,
+    mode: str = "api",
+    cache_dir: str = None,
+    ref: str = None,
+    subdir: str = None,
+    since: str = None
 ):
     """
-    Crawl files from a specific path in a GitHub repository at a specific commit.
+    Lazily yield (path, content) records from a GitHub repository at a specific commit.
+
+    Each file body is yielded as soon as it is read or downloaded, so callers can
+    process a repository without holding every file in memory at once. HTTPS
+    URLs are listed with one Git Trees API call, filtered locally by path and
+    blob size, and only the selected blobs are downloaded concurrently.
 
     Args:
         repo_url (str): URL of the GitHub repository with specific path and commit
@@ -26,103 +289,57 @@ def crawl_github_files(
             - **Required for private repositories.**
             - **Recommended for public repos to avoid rate limits.**
             - Can be passed explicitly or set via the `GITHUB_TOKEN` environment variable.
+            - Extra tokens in `GITHUB_TOKENS` (comma-separated) are rotated in as budgets run out.
         max_file_size (int, optional): Maximum file size in bytes to download (default: 1 MB)
         use_relative_paths (bool, optional): If True, file paths will be relative to the specified subdirectory
         include_patterns (str or set of str, optional): Pattern or set of patterns specifying which files to include (e.g., "*.py", {"*.md", "*.txt"}).
                                                        If None, all files are included.
         exclude_patterns (str or set of str, optional): Pattern or set of patterns specifying which files to exclude.
                                                        If None, no files are excluded.
+        stats (dict, optional): Filled with the crawl statistics once the generator is exhausted
+        max_workers (int, optional): Number of concurrent blob downloads (default: 8)
+        mode (str, optional): "api" (Trees API + blob downloads), "tarball" (stream the
+                              codeload tarball for the ref; best for full-repo runs) or
+                              "mirror" (git fetch into a persistent bare mirror under
+                              cache_dir; best for repositories crawled repeatedly)
+        cache_dir (str, optional): Root of the on-disk crawl cache; when set, API and raw
+                                   responses are revalidated with ETags instead of refetched,
+                                   and file bodies are reused across refs by blob SHA.
+                                   SSH URLs and mirror mode keep a bare mirror per repository there
+        ref (str, optional): Branch, tag or commit to crawl. Needed for SSH URLs, which cannot
+                             embed one; for HTTPS URLs a /tree/<ref> segment takes precedence
+        subdir (str, optional): Subdirectory to crawl, as the path after /tree/<ref>/ does
+                                for HTTPS URLs
+        since (str, optional): Only fetch files changed between this ref and ref (plus
+                               same-stem siblings as context). Uses a git diff for SSH and
+                               mirror mode and the compare API otherwise; "changed_paths"
+                               and "deleted_paths" are added to stats
 
-    Returns:
-        dict: Dictionary with files and statistics
+    Yields:
+        tuple: (path, content)
     """
-    # Convert single pattern to set
-    if include_patterns and isinstance(include_patterns, str):
-        include_patterns = {include_patterns}
-    if exclude_patterns and isinstance(exclude_patterns, str):
-        exclude_patterns = {exclude_patterns}
-
-    def should_include_file(file_path: str, file_name: str) -> bool:
-        """Determine if a file should be included based on patterns"""
-        # If no include patterns are specified, include all files
-        if not include_patterns:
-            include_file = True
-        else:
-            # Check if file matches any include pattern
-            include_file = any(fnmatch.fnmatch(file_name, pattern) for pattern in include_patterns)
-
-        # If exclude patterns are specified, check if file should be excluded
-        if exclude_patterns and include_file:
-            # Exclude if file matches any exclude pattern
-            exclude_file = any(fnmatch.fnmatch(file_path, pattern) for pattern in exclude_patterns)
-            return not exclude_file
+    if stats is None:
+        stats = {}
 
-        return include_file
+    # Compile include/exclude patterns once; skipped files are tallied per reason
+    path_filter = PathFilter(include_patterns, exclude_patterns, max_file_size)
+    include_patterns = path_filter.include_patterns or None
+    exclude_patterns = path_filter.exclude_patterns or None
 
     # Detect SSH URL (git@ or .git suffix)
     is_ssh_url = repo_url.startswith("git@") or repo_url.endswith(".git")
 
     if is_ssh_url:
-        # Clone repo via SSH to temp dir
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            print(f"Cloning SSH repo {repo_url} to temp dir {tmpdirname} ...")
-            try:
-                repo = git.Repo.clone_from(repo_url, tmpdirname)
-            except Exception as e:
-                print(f"Error cloning repo: {e}")
-                return {"files": {}, "stats": {"error": str(e)}}
-
-            # Attempt to checkout specific commit/branch if in URL
-            # Parse ref and subdir from SSH URL? SSH URLs don't have branch info embedded
-            # So rely on default branch, or user can checkout manually later
-            # Optionally, user can pass ref explicitly in future API
-
-            # Walk directory
-            files = {}
-            skipped_files = []
-
-            for root, dirs, filenames in os.walk(tmpdirname):
-                for filename in filenames:
-                    abs_path = os.path.join(root, filename)
-                    rel_path = os.path.relpath(abs_path, tmpdirname)
-
-                    # Check file size
-                    try:
-                        file_size = os.path.getsize(abs_path)
-                    except OSError:
-                        continue
-
-                    if file_size > max_file_size:
-                        skipped_files.append((rel_path, file_size))
-                        print(f"Skipping {rel_path}: size {file_size} exceeds limit {max_file_size}")
-                        continue
-
-                    # Check include/exclude patterns
-                    if not should_include_file(rel_path, filename):
-                        print(f"Skipping {rel_path}: does not match include/exclude patterns")
-                        continue
-
-                    # Read content
-                    try:
-                        with open(abs_path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                        files[rel_path] = content
-                        print(f"Added {rel_path} ({file_size} bytes)")
-                    except Exception as e:
-                        print(f"Failed to read {rel_path}: {e}")
-
-            return {
-                "files": files,
-                "stats": {
-                    "downloaded_count": len(files),
-                    "skipped_count": len(skipped_files),
-                    "skipped_files": skipped_files,
-                    "base_path": None,
-                    "include_patterns": include_patterns,
-                    "exclude_patterns": exclude_patterns,
-                    "source": "ssh_clone"
-                }
-            }
+        # Shallow, partial, bare fetch over SSH (git transport; no Trees API)
+        yield from _iter_git_files(repo_url, ref, subdir, use_relative_paths, path_filter, stats,
+                                   cache_dir=cache_dir, since=since)
+        if "error" not in stats:
+            stats.update({
+                "include_patterns": include_patterns,
+                "exclude_patterns": exclude_patterns,
+                "source": "ssh_clone"
+            })
+        return
 
     # Parse GitHub URL to extract owner, repo, commit/branch, and path
     parsed_url = urlparse(repo_url)
@@ -143,150 +360,218 @@ def crawl_github_files(
         path_start = tree_index + 2
         specific_path = '/'.join(path_parts[path_start:]) if path_start < len(path_parts) else ""
     else:
-        ref = "main"  # Default branch
-        specific_path = ""
+        # An explicit ref or None, which is resolved to the repository's default branch below
+        specific_path = (subdir or "").strip("/")
     
-    # Setup for GitHub API
-    headers = {"Accept": "application/vnd.github.v3+json"}
-    if token:
-        headers["Authorization"] = f"token {token}"
+    if mode not in GITHUB_MODES:
+        raise ValueError(f"Unknown GitHub crawl mode: {mode} (expected one of {', '.join(GITHUB_MODES)})")
     
-    # Dictionary to store path -> content mapping
-    files = {}
-    skipped_files = []
+    if mode == "mirror":
+        # Fetch over git-over-HTTPS into the mirror cache (or a temp dir) instead of calling the API
+        clone_url = f"{parsed_url.scheme}://{parsed_url.netloc}/{owner}/{repo}.git"
+        env = None
+        tokens = [t for t in resolve_tokens(token) if t]
+        if tokens:
+            # Pass the token as a header so it never lands in the mirror's config
+            basic = base64.b64encode(f"x-access-token:{tokens[0]}".encode()).decode()
+            env = {"GIT_CONFIG_COUNT": "1", "GIT_CONFIG_KEY_0": "http.extraHeader",
+                   "GIT_CONFIG_VALUE_0": f"Authorization: Basic {basic}"}
+        yield from _iter_git_files(clone_url, ref, specific_path, use_relative_paths, path_filter, stats,
+                                   cache_dir=cache_dir, env=env, since=since)
+        if "error" not in stats:
+            stats.update({
+                "include_patterns": include_patterns,
+                "exclude_patterns": exclude_patterns,
+                "source": "mirror" if cache_dir else "git_clone"
+            })
+        return
     
-    def should_include_file(file_path: str, file_name: str) -> bool:
-        """Determine if a file should be included based on patterns"""
-        # If no include patterns are specified, include all files
-        if not include_patterns:
-            include_file = True
-        else:
-            # Check if file matches any include pattern
-            include_file = any(fnmatch.fnmatch(file_name, pattern) for pattern in include_patterns)
-        
-        # If exclude patterns are specified, check if file should be excluded
-        if exclude_patterns and include_file:
-            # Exclude if file matches any exclude pattern
-            exclude_file = any(fnmatch.fnmatch(file_path, pattern) for pattern in exclude_patterns)
-            return not exclude_file
-        
-        return include_file
+    # One pooled, rate-limit-aware client for the listing and all blob downloads,
+    # rotating across the token and any extra tokens in GITHUB_TOKENS
+    http_cache = HttpCache(os.path.join(cache_dir, "http")) if cache_dir else None
+    session = RateLimitScheduler(resolve_tokens(token), api_url=GITHUB_API_URL,
+                                 max_workers=max_workers, cache=http_cache)
+    authenticated = bool(token) or session.has_token
     
-    def fetch_contents(path):
-        """Fetch contents of the repository at a specific path and commit"""
-        url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
-        params = {"ref": ref}
-        
-        response = requests.get(url, headers=headers, params=params)
-        
-        if response.status_code == 403 and 'rate limit exceeded' in response.text.lower():
-            reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-            wait_time = max(reset_time - time.time(), 0) + 1
-            print(f"Rate limit exceeded. Waiting for {wait_time:.0f} seconds...")
-            time.sleep(wait_time)
-            return fetch_contents(path)
-            
-        if response.status_code == 404:
-            if not token:
-                print(f"Error 404: Repository not found or is private.\n"
-                      f"If this is a private repository, please provide a valid GitHub token via the 'token' argument or set the GITHUB_TOKEN environment variable.")
-            else:
-                print(f"Error 404: Path '{path}' not found in repository or insufficient permissions with the provided token.\n"
-                      f"Please verify the token has access to this repository and the path exists.")
-            return
-            
-        if response.status_code != 200:
-            print(f"Error fetching {path}: {response.status_code} - {response.text}")
+    if ref is None:
+        ref = _default_branch(session, owner, repo)
+    # Pin the crawl to one commit so a branch that moves mid-crawl cannot mix snapshots
+    commit = _resolve_commit(session, owner, repo, ref)
+    if commit is None:
+        print(f"Warning: Could not resolve {ref} to a commit; reading the ref directly.")
+    snapshot = commit or ref
+    
+    if since:
+        changes = compare_changes(session, GITHUB_API_URL, owner, repo, since, snapshot)
+        if changes is None:
+            session.close()
+            stats["error"] = f"Could not compare {since}...{ref} for {owner}/{repo}"
             return
+        # Tarball members are always relative to the subdirectory
+        _restrict_to_changes(path_filter, changes, specific_path, use_relative_paths, stats,
+                             filter_relative=True if mode == "tarball" else None)
+    
+    if mode == "tarball":
+        tar_stats = {}
+        try:
+            for path, content in _iter_tarball(session, owner, repo, snapshot, specific_path, authenticated,
+                                               path_filter, tar_stats):
+                # Archive paths are relative to the subdirectory; restore the repo path if asked
+                if specific_path and not use_relative_paths:
+                    path = f"{specific_path}/{path}"
+                yield path, content
+        finally:
+            session.close()
+        stats.update({
+            "downloaded_count": tar_stats.get("downloaded_count", 0),
+            "skipped_count": len(tar_stats.get("skipped_files", [])),
+            "skipped_files": tar_stats.get("skipped_files", []),
+            "base_path": specific_path if use_relative_paths else None,
+            "include_patterns": include_patterns,
+            "exclude_patterns": exclude_patterns,
+            "skip_counts": dict(path_filter.skipped),
+            "ref": ref,
+            "commit": commit,
+            "source": "tarball"
+        })
+        if "error" in tar_stats:
+            stats["error"] = tar_stats["error"]
+        return
+    
+    # List the whole tree in a single call and prefilter by path pattern and blob size locally
+    blobs = _list_tree(session, owner, repo, snapshot, specific_path, authenticated)
+    if blobs is None:
+        session.close()
+        stats.update({"error": f"Could not list tree for {owner}/{repo}@{ref}"})
+        return
+    
+    downloaded_count = 0
+    skipped_files = []
+    selected = []
+    for blob in blobs:
+        item_path = blob["path"]
         
-        contents = response.json()
-        
-        # Handle both single file and directory responses
-        if not isinstance(contents, list):
-            contents = [contents]
+        # Calculate relative path if requested
+        if use_relative_paths and specific_path:
+            rel_path = item_path[len(specific_path):].lstrip('/')
+        else:
+            rel_path = item_path
         
-        for item in contents:
-            item_path = item["path"]
-            
-            # Calculate relative path if requested
-            if use_relative_paths and specific_path:
-                # Make sure the path is relative to the specified subdirectory
-                if item_path.startswith(specific_path):
-                    rel_path = item_path[len(specific_path):].lstrip('/')
-                else:
-                    rel_path = item_path
-            else:
-                rel_path = item_path
-            
-            if item["type"] == "file":
-                # Check if file should be included based on patterns
-                if not should_include_file(rel_path, item["name"]):
-                    print(f"Skipping {rel_path}: Does not match include/exclude patterns")
-                    continue
-                
-                # Check file size if available
-                file_size = item.get("size", 0)
-                if file_size > max_file_size:
-                    skipped_files.append((item_path, file_size))
-                    print(f"Skipping {rel_path}: File size ({file_size} bytes) exceeds limit ({max_file_size} bytes)")
-                    continue
-                
-                # For files, get raw content
-                if "download_url" in item and item["download_url"]:
-                    file_url = item["download_url"]
-                    file_response = requests.get(file_url, headers=headers)
-                    
-                    # Final size check in case content-length header is available but differs from metadata
-                    content_length = int(file_response.headers.get('content-length', 0))
-                    if content_length > max_file_size:
-                        skipped_files.append((item_path, content_length))
-                        print(f"Skipping {rel_path}: Content length ({content_length} bytes) exceeds limit ({max_file_size} bytes)")
-                        continue
-                        
-                    if file_response.status_code == 200:
-                        files[rel_path] = file_response.text
-                        print(f"Downloaded: {rel_path} ({file_size} bytes) ")
-                    else:
-                        print(f"Failed to download {rel_path}: {file_response.status_code}")
-                else:
-                    # Alternative method if download_url is not available
-                    content_response = requests.get(item["url"], headers=headers)
-                    if content_response.status_code == 200:
-                        content_data = content_response.json()
-                        if content_data.get("encoding") == "base64" and "content" in content_data:
-                            # Check size of base64 content before decoding
-                            if len(content_data["content"]) * 0.75 > max_file_size:  # Approximate size calculation
-                                estimated_size = int(len(content_data["content"]) * 0.75)
-                                skipped_files.append((item_path, estimated_size))
-                                print(f"Skipping {rel_path}: Encoded content exceeds size limit")
-                                continue
-                                
-                            file_content = base64.b64decode(content_data["content"]).decode('utf-8')
-                            files[rel_path] = file_content
-                            print(f"Downloaded: {rel_path} ({file_size} bytes)")
-                        else:
-                            print(f"Unexpected content format for {rel_path}")
-                    else:
-                        print(f"Failed to get content for {rel_path}: {content_response.status_code}")
-            
-            elif item["type"] == "dir":
-                # Recursively process subdirectories
-                fetch_contents(item_path)
+        # Check include/exclude patterns, binary extensions and size
+        reason = path_filter.skip_reason(rel_path, blob.get("size", 0))
+        if reason:
+            path_filter.record_skip(reason)
+            if reason == "size":
+                skipped_files.append((item_path, blob.get("size", 0)))
+            continue
+        selected.append((rel_path, blob))
     
-    # Start crawling from the specified path
-    fetch_contents(specific_path)
+    print(f"Selected {len(selected)} of {len(blobs)} files in {owner}/{repo}@{ref}; downloading with {max_workers} workers...")
     
-    return {
-        "files": files,
-        "stats": {
-            "downloaded_count": len(files),
-            "skipped_count": len(skipped_files),
-            "skipped_files": skipped_files,
-            "base_path": specific_path if use_relative_paths else None,
-            "include_patterns": include_patterns,
-            "exclude_patterns": exclude_patterns
-        }
-    }
+    # Bodies are keyed by blob SHA, so files unchanged between refs are never downloaded twice
+    blob_store = BlobStore(os.path.join(cache_dir, "blobs")) if cache_dir else None
+    
+    def download(blob):
+        """Download one blob (unless it is already stored), returning its decoded text or None"""
+        content = blob_store.get(blob["sha"]) if blob_store is not None else None
+        if content is None:
+            content = _download_blob(session, owner, repo, snapshot, blob)
+            if content is None:
+                path_filter.record_skip("error")
+                return None
+            if blob_store is not None:
+                blob_store.put(blob["sha"], content)
+        if path_filter.too_large(len(content)):
+            skipped_files.append((blob["path"], len(content)))
+            path_filter.record_skip("size")
+            return None
+        text = decode_text(content)
+        if text is None:
+            path_filter.record_skip("binary")
+        return text
+    
+    # Download the selected blobs concurrently, yielding in tree order with bounded in-flight requests
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = deque()
+            for rel_path, blob in selected:
+                in_flight.append((rel_path, executor.submit(download, blob)))
+                while len(in_flight) >= max_workers * 2 or (in_flight and in_flight[0][1].done()):
+                    done_path, future = in_flight.popleft()
+                    content = future.result()
+                    if content is not None:
+                        downloaded_count += 1
+                        yield done_path, content
+            while in_flight:
+                done_path, future = in_flight.popleft()
+                content = future.result()
+                if content is not None:
+                    downloaded_count += 1
+                    yield done_path, content
+    finally:
+        session.close()
+    print(f"Downloaded {downloaded_count} files. {path_filter.summary()}")
+    
+    stats.update({
+        "downloaded_count": downloaded_count,
+        "skipped_count": len(skipped_files),
+        "skipped_files": skipped_files,
+        "base_path": specific_path if use_relative_paths else None,
+        "include_patterns": include_patterns,
+        "exclude_patterns": exclude_patterns,
+        "skip_counts": dict(path_filter.skipped),
+        "ref": ref,
+        "commit": commit,
+        "source": "trees_api"
+    })
+    if http_cache is not None:
+        stats["http_cache"] = {"hits": http_cache.hits, "misses": http_cache.misses}
+        print(f"HTTP cache: {http_cache.hits} responses revalidated (304), {http_cache.misses} fetched.")
+    if blob_store is not None:
+        blob_store.prune()
+        stats["blob_store"] = blob_store.stats()
+        print(f"Blob store: {blob_store.hits} files reused ({blob_store.bytes_saved} bytes not downloaded), "
+              f"{blob_store.evicted} evicted.")
+
+def crawl_github_files(
+    repo_url, 
+    token=None, 
+    max_file_size: int = 1 * 1024 * 1024,  # 1 MB
+    use_relative_paths: bool = False,
+    include_patterns: Union[str, Set[str]] = None,
+    exclude_patterns: Union[str, Set[str]] = None,
+    max_workers: int = DEFAULT_FETCH_WORKERS,
+    mode: str = "api",
+    cache_dir: str = None,
+    ref: str = None,
+    subdir: str = None,
+    since: str = None
+):
+    """
+    Crawl files from a specific path in a GitHub repository at a specific commit.
+
+    Collects iter_github_files into a dict; see it for the argument details.
+
+    Returns:
+        dict: Dictionary with files and statistics
+    """
+    stats = {}
+    files = dict(iter_github_files(
+        repo_url,
+        token=token,
+        max_file_size=max_file_size,
+        use_relative_paths=use_relative_paths,
+        include_patterns=include_patterns,
+        exclude_patterns=exclude_patterns,
+        stats=stats,
+        max_workers=max_workers,
+        mode=mode,
+        cache_dir=cache_dir,
+        ref=ref,
+        subdir=subdir,
+        since=since
+    ))
+    return {"files": files, "stats": stats}
 
 # Example usage
 if __name__ == "__main__":
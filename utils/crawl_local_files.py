@@ -1,104 +1,251 @@
 import os
-import fnmatch
+import stat
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from utils.file_filter import PathFilter, decode_text
+from utils.change_set import local_changes
+from utils.gitignore import GitIgnore, git_ls_files
 
-def crawl_local_files(directory, include_patterns=None, exclude_patterns=None, max_file_size=None, use_relative_paths=True):
+# Default number of threads used to read file contents
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+def _read_text_file(filepath, path_filter):
     """
-    Crawl files in a local directory with similar interface as crawl_github_files.
-    
+    Read a file once and decode it as text.
+
+    Returns:
+        str or None: The decoded content, or None if the file is binary or not UTF-8
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            data = f.read()
+    except Exception as e:
+        print(f"Warning: Could not read file {filepath}: {e}")
+        path_filter.record_skip("error")
+        return None
+
+    content = decode_text(data)
+    if content is None:
+        # Skip files that can't be decoded as text
+        path_filter.record_skip("binary")
+    return content
+
+def _load_candidate(candidate, path_filter, manifest):
+    """Serve an unchanged file from the manifest, otherwise read and record it"""
+    key, filepath, st = candidate
+    if manifest is not None:
+        content = manifest.lookup(key, st.st_size, st.st_mtime_ns)
+        if content is not None:
+            return content
+
+    content = _read_text_file(filepath, path_filter)
+    if content is not None and manifest is not None:
+        manifest.record(key, st.st_size, st.st_mtime_ns, content)
+    return content
+
+def _git_candidates(directory, paths, path_filter, use_relative_paths):
+    """
+    Yield (key, filepath, stat) for files listed by git that pass the filter.
+
+    Pattern checks run on the listed paths first, so only surviving files are stat-ed.
+    """
+    for relpath in paths:
+        reason = path_filter.skip_reason(relpath)
+        if reason:
+            path_filter.record_skip(reason)
+            continue
+        filepath = os.path.join(directory, *relpath.split("/"))
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            # Tracked but deleted from the work tree
+            continue
+        if not stat.S_ISREG(st.st_mode):
+            # Submodules and other non-files
+            continue
+        if path_filter.too_large(st.st_size):
+            path_filter.record_skip("size")
+            continue
+        key = relpath.replace("/", os.sep) if use_relative_paths else filepath
+        yield key, filepath, st
+
+def _scan_candidates(directory, path_filter, use_relative_paths, need_stat=False, respect_gitignore=True):
+    """
+    Yield (key, filepath, stat) for files that pass the filter.
+
+    Inside a git work tree the file list comes from the git index (tracked plus
+    untracked-not-ignored). Otherwise the directory is walked with os.scandir,
+    pruning excluded directories before they are entered and, if
+    respect_gitignore is set, anything matched by a .gitignore on the way.
+    """
+    ignore = None
+    if respect_gitignore:
+        paths = git_ls_files(directory)
+        if paths is not None:
+            print(f"Listing {len(paths)} files from the git index...")
+            yield from _git_candidates(directory, paths, path_filter, use_relative_paths)
+            return
+        ignore = GitIgnore()
+
+    stack = [(directory, "")]
+    while stack:
+        current_dir, rel_dir = stack.pop()
+        try:
+            with os.scandir(current_dir) as it:
+                entries = list(it)
+        except OSError as e:
+            print(f"Warning: Could not list directory {current_dir}: {e}")
+            continue
+        if ignore is not None:
+            ignore.load(current_dir, rel_dir)
+
+        subdirs = []
+        for entry in entries:
+            relpath = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if ignore is not None and (entry.name == ".git" or ignore.is_ignored(relpath, is_dir=True)):
+                        path_filter.record_skip("ignored")
+                        continue
+                    if not path_filter.can_skip_dir(relpath):
+                        subdirs.append((entry.path, relpath))
+                    continue
+                if not entry.is_file():
+                    continue
+                # The size check uses the stat result cached by scandir
+                st = entry.stat() if (need_stat or path_filter.max_file_size) else None
+            except OSError:
+                continue
+
+            if ignore is not None and ignore.is_ignored(relpath):
+                path_filter.record_skip("ignored")
+                continue
+            if not path_filter.check(relpath, st.st_size if st else None):
+                continue
+
+            key = relpath.replace("/", os.sep) if use_relative_paths else entry.path
+            yield key, entry.path, st
+
+        # Visit subdirectories in listing order
+        stack.extend(reversed(subdirs))
+
+def iter_local_files(directory, include_patterns=None, exclude_patterns=None, max_file_size=None,
+                     use_relative_paths=True, max_workers=None, manifest=None, stats=None, since=None,
+                     respect_gitignore=True):
+    """
+    Lazily yield (filepath, content) records from a local directory.
+
+    Files are read on a thread pool with at most 2 * max_workers reads in
+    flight, so memory stays bounded no matter how slowly the consumer pulls
+    records. Records are yielded in crawl order.
+
     Args:
         directory (str): Path to local directory
         include_patterns (set): File patterns to include (e.g. {"*.py", "*.js"})
         exclude_patterns (set): File patterns to exclude (e.g. {"tests/*"})
         max_file_size (int): Maximum file size in bytes
         use_relative_paths (bool): Whether to use paths relative to directory
-        
-    Returns:
-        dict: {"files": {filepath: content}}
+        max_workers (int): Number of threads used to read files (default: DEFAULT_MAX_WORKERS)
+        manifest (CrawlManifest, optional): Snapshot of the previous crawl; unchanged
+                                            files are served from its content store
+        stats (dict, optional): Filled with "skipped" counters (and "changes" when a
+                                manifest is given) once the crawl is exhausted
+        since (str, optional): Git revision; only files changed since it (plus same-stem
+                               siblings) are read, and "changed_paths"/"deleted_paths"
+                               are added to stats. The manifest is not used in this mode.
+        respect_gitignore (bool): List files from the git index inside a work tree, or
+                                  honor .gitignore files outside one (default: True)
+
+    Yields:
+        tuple: (filepath, content)
     """
     if not os.path.isdir(directory):
         raise ValueError(f"Directory does not exist: {directory}")
-        
-    files_dict = {}
+
+    path_filter = PathFilter(include_patterns, exclude_patterns, max_file_size)
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
     
+    changes = None
+    if since:
+        changes = local_changes(directory, since)
+        path_filter.restrict(changes["changed"])
+        print(f"{len(changes['changed'])} files changed and {len(changes['deleted'])} deleted since {since}.")
+        # A partial crawl must not replace the manifest snapshot
+        manifest = None
+    max_in_flight = max_workers * 2
+    fetched = 0
+
     print(f"Crawling directory: {directory}...")
-    
-    for root, _, files in os.walk(directory):
-        for filename in files:
-            filepath = os.path.join(root, filename)
-            
-            # Get path relative to directory if requested
-            if use_relative_paths:
-                relpath = os.path.relpath(filepath, directory)
-            else:
-                relpath = filepath
-                
-            # Check if file matches any include pattern
-            included = False
-            if include_patterns:
-                for pattern in include_patterns:
-                    if fnmatch.fnmatch(relpath, pattern):
-                        included = True
-                        break
-            else:
-                included = True
-                
-            # Check if file matches any exclude pattern
-            excluded = False
-            if exclude_patterns:
-                for pattern in exclude_patterns:
-                    if fnmatch.fnmatch(relpath, pattern):
-                        excluded = True
-                        break
-                        
-            if not included or excluded:
-                continue
-                
-            # Check file size
-            if max_file_size and os.path.getsize(filepath) > max_file_size:
-                continue
-                
-            # Better binary file detection - check file extension first
-            file_ext = os.path.splitext(filename)[1].lower()
-            binary_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.pdf', 
-                               '.zip', '.gz', '.tar', '.rar', '.exe', '.dll', '.so', '.bin',
-                               '.pyc', '.pyd', '.o', '.obj', '.dat', '.db', '.sqlite', '.db3',
-                               '.xlsx', '.xls', '.doc', '.docx', '.ppt', '.pptx', '.class',
-                               '.jar', '.war', '.ttf', '.otf', '.woff', '.woff2', '.eot', '.svg',
-                               '.tiff', '.tif', '.psd', '.mp3', '.mp4', '.avi', '.mkv', '.mov',
-                               '.wmv', '.wav', '.flac', '.dmg', '.iso', '.img', '.ds_store'}
-                
-            if file_ext in binary_extensions or filename.lower() == '.ds_store':
-                continue
-                
-            try:
-                # Check for binary content
-                is_binary = False
-                with open(filepath, 'rb') as f:
-                    chunk = f.read(1024)
-                    # Check for null bytes or high percentage of non-printable chars
-                    if b'\x00' in chunk or sum(c < 9 or 13 < c < 32 or c > 126 for c in chunk) > len(chunk) * 0.1:
-                        is_binary = True
-                
-                if is_binary:
-                    continue
-                
-                # Try reading as UTF-8
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    files_dict[relpath] = content
-                    
-            except UnicodeDecodeError:
-                # Skip files that can't be decoded as text
+
+    candidates = _scan_candidates(directory, path_filter, use_relative_paths,
+                                  need_stat=manifest is not None, respect_gitignore=respect_gitignore)
+
+    # Read and check content on a bounded thread pool, one open per file
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        for candidate in candidates:
+            in_flight.append((candidate[0], executor.submit(_load_candidate, candidate, path_filter, manifest)))
+            if len(in_flight) < max_in_flight:
                 continue
-            except Exception as e:
-                print(f"Warning: Could not read file {filepath}: {e}")
-                
-    print(f"Fetched {len(files_dict)} files.")
-    return {"files": files_dict}
+            key, future = in_flight.popleft()
+            content = future.result()
+            if content is not None:
+                fetched += 1
+                yield key, content
+        while in_flight:
+            key, future = in_flight.popleft()
+            content = future.result()
+            if content is not None:
+                fetched += 1
+                yield key, content
+
+    print(f"Fetched {fetched} files. {path_filter.summary()}")
+    if stats is not None:
+        stats["skipped"] = dict(path_filter.skipped)
+        if changes is not None:
+            to_key = (lambda p: p.replace("/", os.sep)) if use_relative_paths \
+                else (lambda p: os.path.join(directory, *p.split("/")))
+            stats["changed_paths"] = [to_key(p) for p in changes["changed"]]
+            stats["deleted_paths"] = [to_key(p) for p in changes["deleted"]]
+    if manifest is not None:
+        # Only a complete crawl may replace the snapshot
+        changes = manifest.finalize()
+        if stats is not None:
+            stats["changes"] = changes
+
+def crawl_local_files(directory, include_patterns=None, exclude_patterns=None, max_file_size=None,
+                      use_relative_paths=True, max_workers=None, manifest=None, respect_gitignore=True):
+    """
+    Crawl files in a local directory with similar interface as crawl_github_files.
+
+    Args:
+        directory (str): Path to local directory
+        include_patterns (set): File patterns to include (e.g. {"*.py", "*.js"})
+        exclude_patterns (set): File patterns to exclude (e.g. {"tests/*"})
+        max_file_size (int): Maximum file size in bytes
+        use_relative_paths (bool): Whether to use paths relative to directory
+        max_workers (int): Number of threads used to read files (default: DEFAULT_MAX_WORKERS)
+        manifest (CrawlManifest, optional): Snapshot of the previous crawl; unchanged
+                                            files are served from its content store
+        respect_gitignore (bool): Skip files git ignores (default: True)
+
+    Returns:
+        dict: {"files": {filepath: content}, "stats": {"skipped": {reason: count}}}
+              plus "changes" (added/changed/deleted paths) when a manifest is given
+    """
+    stats = {}
+    files_dict = dict(iter_local_files(
+        directory, include_patterns, exclude_patterns, max_file_size,
+        use_relative_paths, max_workers, manifest, stats, respect_gitignore=respect_gitignore
+    ))
+    result = {"files": files_dict, "stats": {"skipped": stats.get("skipped", {})}}
+    if manifest is not None:
+        result["changes"] = stats.get("changes")
+    return result
 
 if __name__ == "__main__":
     print("--- Crawling parent directory ('..') ---")
     files_data = crawl_local_files("..", exclude_patterns={"*.pyc", "__pycache__/*", ".git/*", "output/*"})
     print(f"Found {len(files_data['files'])} files:")
     for path in files_data["files"]:
-        print(f"  {path}")
\ No newline at end of file
+        print(f"  {path}")
@@ -0,0 +1,102 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from utils.content_store import ContentStore, DEFAULT_CACHE_DIR, content_hash
+
+class CrawlManifest:
+    """
+    On-disk snapshot of a local source root: path -> size, mtime_ns and content hash.
+
+    A crawl asks lookup() for each candidate; files whose size and mtime_ns are
+    unchanged since the last run are served from the content store instead of
+    being reread and re-decoded. After the crawl, finalize() saves the new
+    snapshot and reports which files were added, changed or deleted.
+    """
+
+    def __init__(self, source_root, cache_dir=DEFAULT_CACHE_DIR):
+        self.source_root = os.path.abspath(source_root)
+        root_key = hashlib.sha256(self.source_root.encode("utf-8")).hexdigest()[:16]
+        self.manifest_path = os.path.join(cache_dir, "manifests", f"{root_key}.json")
+        self.store = ContentStore(os.path.join(cache_dir, "objects"))
+        self.previous = self._load()
+        self.current = {}
+        self.reused_count = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Load the previous snapshot, starting fresh if it is missing or unreadable"""
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("source_root") != self.source_root:
+                return {}
+            return data.get("files", {})
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not load crawl manifest {self.manifest_path}: {e}")
+            return {}
+
+    def lookup(self, path, size, mtime_ns):
+        """
+        Return the cached content for an unchanged file.
+
+        Returns:
+            str or None: The stored content, or None if the file must be reread
+        """
+        entry = self.previous.get(path)
+        if not entry or entry["size"] != size or entry["mtime_ns"] != mtime_ns:
+            return None
+        data = self.store.get(entry["hash"])
+        if data is None:
+            return None
+        with self._lock:
+            self.current[path] = entry
+            self.reused_count += 1
+        return data.decode("utf-8")
+
+    def record(self, path, size, mtime_ns, content):
+        """Save freshly read content to the store and add it to the new snapshot"""
+        data = content.encode("utf-8")
+        digest = content_hash(data)
+        self.store.put(digest, data)
+        with self._lock:
+            self.current[path] = {"size": size, "mtime_ns": mtime_ns, "hash": digest}
+
+    def changes(self):
+        """
+        Compare the new snapshot with the previous one.
+
+        Returns:
+            dict: {"added": [...], "changed": [...], "deleted": [...],
+                   "unchanged_count": int, "reused_count": int, "is_noop": bool}
+        """
+        previous, current = self.previous, self.current
+        added = sorted(p for p in current if p not in previous)
+        deleted = sorted(p for p in previous if p not in current)
+        changed = sorted(p for p in current if p in previous and previous[p]["hash"] != current[p]["hash"])
+        return {
+            "added": added,
+            "changed": changed,
+            "deleted": deleted,
+            "unchanged_count": len(current) - len(added) - len(changed),
+            "reused_count": self.reused_count,
+            "is_noop": not (added or changed or deleted),
+        }
+
+    def finalize(self):
+        """Write the new snapshot atomically and return the change set"""
+        changes = self.changes()
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.manifest_path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"source_root": self.source_root, "files": self.current}, f)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            print(f"Warning: Could not save crawl manifest {self.manifest_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return changes
@@ -0,0 +1,187 @@
+import os
+import re
+from utils.content_store import content_hash
+
+# Language of a file by (lowercase) extension; anything else uses the bare extension
+LANGUAGES = {
+    ".cs": "csharp", ".vb": "vb",
+    ".aspx": "aspnet", ".ascx": "aspnet", ".asax": "aspnet", ".master": "aspnet", ".ashx": "aspnet",
+    ".cshtml": "razor", ".razor": "razor",
+    ".js": "javascript", ".jsx": "javascript", ".ts": "typescript", ".tsx": "typescript",
+    ".vue": "vue", ".svelte": "svelte", ".html": "html", ".htm": "html",
+    ".css": "css", ".scss": "css", ".less": "css",
+    ".sql": "sql", ".proc": "sql", ".stored_procedure": "sql", ".py": "python", ".java": "java",
+    ".json": "json", ".xml": "xml", ".config": "xml", ".resx": "xml",
+    ".yml": "yaml", ".yaml": "yaml", ".ini": "ini", ".md": "markdown",
+}
+
+ROLES = ("ui", "component", "service", "sql", "config", "designer", "other")
+
+UI_EXTENSIONS = {".tsx", ".jsx", ".vue", ".svelte", ".razor", ".cshtml", ".aspx", ".html"}
+UI_CODE_EXTENSIONS = {".ts", ".js", ".cs", ".java"}
+COMPONENT_EXTENSIONS = {".tsx", ".jsx", ".vue", ".svelte"}
+CONFIG_EXTENSIONS = {".config", ".json", ".xml", ".yml", ".yaml", ".ini", ".settings", ".env"}
+UI_PATH_HINTS = ("component", "view", "page", "screen", "ui")
+SERVICE_PATH_HINTS = ("service", "provider", "store", "api", "controller")
+SQL_EXTENSIONS = {".sql", ".proc", ".stored_procedure"}
+SQL_PATH_HINTS = ("proc", "procedure", "sp_")
+
+_NUMBER = re.compile(r"\d+")
+
+def classify_role(path):
+    """
+    Return the role of a file from its path.
+
+    SQL sources (.sql, .proc, .stored_procedure) are "sql" and generated
+    *.designer.* files are "designer"; otherwise UI, component and service
+    files are recognized by path hints and extension, then files whose path
+    suggests stored procedures are "sql" and configuration formats are "config".
+    Whether a file may hold stored procedures is decided separately, by
+    is_sql_candidate().
+    """
+    lower = path.lower()
+    filename = os.path.basename(lower)
+    ext = os.path.splitext(lower)[1]
+    if ext in SQL_EXTENSIONS:
+        return "sql"
+    if ".designer." in filename:
+        return "designer"
+    if any(x in lower for x in UI_PATH_HINTS):
+        if ext in UI_EXTENSIONS:
+            return "ui"
+        if ext in UI_CODE_EXTENSIONS:
+            return "component"
+    elif ext in COMPONENT_EXTENSIONS:
+        return "component"
+    elif any(x in lower for x in SERVICE_PATH_HINTS):
+        return "service"
+    if any(x in lower for x in SQL_PATH_HINTS):
+        return "sql"
+    if ext in CONFIG_EXTENSIONS:
+        return "config"
+    return "other"
+
+def is_sql_candidate(path):
+    """
+    Return True if a file may contain stored procedures.
+
+    Independent of the role: any SQL source, or any path mentioning proc,
+    procedure or sp_ (e.g. services/sp_GetUser.cs) is scanned.
+    """
+    lower = path.lower()
+    return os.path.splitext(lower)[1] in SQL_EXTENSIONS or any(x in lower for x in SQL_PATH_HINTS)
+
+class FileRecord:
+    """Metadata of one crawled file; index is its position in shared["files"]"""
+
+    __slots__ = ("index", "path", "extension", "language", "size", "line_count",
+                 "content_hash", "role", "sql_candidate", "component_id")
+
+    def __init__(self, index, path, content):
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        filename = os.path.basename(path)
+        self.index = index
+        self.path = path
+        self.extension = os.path.splitext(filename)[1].lower()
+        self.language = LANGUAGES.get(self.extension, self.extension.lstrip(".") or "text")
+        self.size = len(data)
+        self.line_count = data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+        self.content_hash = content_hash(data)
+        self.role = classify_role(path)
+        self.sql_candidate = is_sql_candidate(path)
+        # Numbered forms (e.g. 1455.aspx, 1455.aspx.cs, 1455.js) share a component id
+        number = _NUMBER.search(filename)
+        self.component_id = int(number.group()) if number else None
+
+    @property
+    def stem(self):
+        """File name without its last extension"""
+        return os.path.splitext(os.path.basename(self.path))[0]
+
+class FileCatalog:
+    """
+    Index of the crawled files, built once by FetchRepo and shared by all nodes.
+
+    Records are addressed by file index; by_role, by_language and by_component
+    map each role, language and component id to the sorted indices of its
+    files, and sql_candidates lists the files that may hold stored
+    procedures, so nodes query them instead of rescanning paths and bodies.
+    """
+
+    def __init__(self, records):
+        self.records = list(records)
+        self.by_path = {}
+        self.by_role = {role: [] for role in ROLES}
+        self.by_language = {}
+        self.by_component = {}
+        self.sql_candidates = []
+        for record in self.records:
+            if record.sql_candidate:
+                self.sql_candidates.append(record.index)
+            self.by_path[record.path] = record.index
+            self.by_role[record.role].append(record.index)
+            self.by_language.setdefault(record.language, []).append(record.index)
+            if record.component_id is not None:
+                self.by_component.setdefault(record.component_id, []).append(record.index)
+
+    @classmethod
+    def build(cls, files_data):
+        """Build the catalog of a list of (path, content) tuples"""
+        return cls(FileRecord(i, path, content) for i, (path, content) in enumerate(files_data))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def indices(self, role=None, language=None, paths=None, sql_candidate=None):
+        """
+        Return the indices of the files matching every given criterion.
+
+        Args:
+            role (str, optional): One of ROLES
+            language (str, optional): A language name from LANGUAGES
+            paths (iterable, optional): Restrict to these paths
+            sql_candidate (bool, optional): True to keep only files that may hold stored procedures
+
+        Returns:
+            list: Sorted file indices
+        """
+        selected = None
+        if role is not None:
+            selected = self.by_role.get(role, [])
+        if language is not None:
+            by_language = self.by_language.get(language, [])
+            selected = by_language if selected is None else sorted(set(selected) & set(by_language))
+        if sql_candidate:
+            selected = self.sql_candidates if selected is None else sorted(set(selected) & set(self.sql_candidates))
+        if paths is not None:
+            wanted = sorted(self.by_path[p] for p in set(paths) if p in self.by_path)
+            selected = wanted if selected is None else sorted(set(selected) & set(wanted))
+        return list(range(len(self.records))) if selected is None else list(selected)
+
+    def component_name(self, indices=None):
+        """
+        Name a set of files after what they have in common.
+
+        Uses the shared stem if all files have one, otherwise the most common
+        component id, otherwise the common prefix of the stems.
+
+        Returns:
+            str or None: The name, or None if there are no files
+        """
+        records = self.records if indices is None else [self.records[i] for i in indices]
+        if not records:
+            return None
+        stems = [r.stem for r in records]
+        if len(set(stems)) == 1:
+            return stems[0]
+        counts = {}
+        for r in records:
+            if r.component_id is not None:
+                counts[r.component_id] = counts.get(r.component_id, 0) + 1
+        if counts:
+            # Ties go to the component seen first, as with Counter.most_common
+            return str(max(counts, key=counts.get))
+        return os.path.commonprefix(stems).rstrip('_-.') or stems[0]
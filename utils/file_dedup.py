@@ -0,0 +1,60 @@
+def find_duplicates(catalog):
+    """
+    Find files whose bodies are byte-identical to an earlier file.
+
+    The first file seen with a given content hash is canonical; every later
+    file with the same hash is recorded in the alias map. Files are keyed by
+    index, not path, since two different files may share a path (e.g. from
+    two uploaded archives). Only the catalog's hashes and sizes are used, so
+    no file body is read.
+
+    Args:
+        catalog (FileCatalog): Catalog of the crawled files
+
+    Returns:
+        tuple: (aliases, stats) where aliases is {duplicate index: canonical index}
+               and stats is {"unique_files", "duplicate_files", "duplicate_bytes", "total_bytes"}
+    """
+    canonical = {}  # content hash -> index
+    aliases = {}
+    duplicate_bytes = total_bytes = 0
+    for record in catalog.records:
+        total_bytes += record.size
+        first = canonical.setdefault(record.content_hash, record.index)
+        if first != record.index:
+            aliases[record.index] = first
+            duplicate_bytes += record.size
+    return aliases, {
+        "unique_files": len(canonical),
+        "duplicate_files": len(aliases),
+        "duplicate_bytes": duplicate_bytes,
+        "total_bytes": total_bytes,
+    }
+
+def group_duplicates(catalog, indices):
+    """
+    Group file indices whose bodies are identical.
+
+    Args:
+        catalog (FileCatalog or None): Catalog of the files; without one every
+                                       file is its own group
+        indices (iterable): File indices to group, in the order to keep
+
+    Returns:
+        list: [(first index, [indices of identical copies]), ...]
+    """
+    groups = {}
+    for i in indices:
+        groups.setdefault(catalog[i].content_hash if catalog is not None else i, []).append(i)
+    return [(members[0], members[1:]) for members in groups.values()]
+
+def format_dedup_stats(stats):
+    """Return a one-line summary of dedup savings"""
+    total = stats["total_bytes"]
+    share = 100.0 * stats["duplicate_bytes"] / total if total else 0.0
+    summary = (f"{stats['unique_files'] + stats['duplicate_files']} files have {stats['unique_files']} unique bodies; "
+               f"{stats['duplicate_bytes']} duplicate bytes ({share:.1f}%) not repeated in prompts")
+    if stats.get("near_duplicate_files"):
+        summary += (f"; {stats['near_duplicate_files']} near-duplicates sent as diffs "
+                    f"({stats['near_duplicate_bytes_saved']} characters saved)")
+    return summary
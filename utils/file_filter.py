@@ -0,0 +1,217 @@
+import os
+import re
+import fnmatch
+import threading
+from collections import Counter
+
+# Default file patterns shared by the CLI, the programmatic runner and the Streamlit app
+DEFAULT_INCLUDE_PATTERNS = {
+    "*.py", "*.js", "*.jsx", "*.ts", "*.tsx", "*.go", "*.java", "*.pyi", "*.pyx",
+    "*.c", "*.cc", "*.cpp", "*.h", "*.md", "*.rst", "Dockerfile",
+    "Makefile", "*.yaml", "*.yml", "*.aspx", "*.aspx.cs", "*.aspx.designer.cs", "*.css",
+    "*.sql", "*.proc", "*.stored_procedure"  # Added SQL-specific patterns
+}
+
+DEFAULT_EXCLUDE_PATTERNS = {
+    "*test*", "tests/*", "docs/*", "examples/*", "v1/*",
+    "dist/*", "build/*", "experimental/*", "deprecated/*",
+    "legacy/*", ".git/*", ".github/*", ".next/*", ".vscode/*", "obj/*", "bin/*", "node_modules/*", "*.log",
+    "*.jpg", "*.png", "*.xlsx", "*.rdlc", "*.pdf",
+    # Build output and dependencies, pruned at every level (e.g. src/Web/obj/Debug)
+    "**/obj/*", "**/node_modules/*"
+}
+
+# Extensions that are never worth decoding as text
+BINARY_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.pdf',
+                     '.zip', '.gz', '.tar', '.rar', '.exe', '.dll', '.so', '.bin',
+                     '.pyc', '.pyd', '.o', '.obj', '.dat', '.db', '.sqlite', '.db3',
+                     '.xlsx', '.xls', '.doc', '.docx', '.ppt', '.pptx', '.class',
+                     '.jar', '.war', '.ttf', '.otf', '.woff', '.woff2', '.eot', '.svg',
+                     '.tiff', '.tif', '.psd', '.mp3', '.mp4', '.avi', '.mkv', '.mov',
+                     '.wmv', '.wav', '.flac', '.dmg', '.iso', '.img', '.ds_store'}
+
+# Follow the platform's case rules, like fnmatch.fnmatch does
+_CASE_INSENSITIVE = os.path.normcase("A") == "a"
+
+def _as_set(patterns):
+    """Convert a single pattern or an iterable of patterns to a set"""
+    if not patterns:
+        return set()
+    if isinstance(patterns, str):
+        return {patterns}
+    return set(patterns)
+
+def _translate(pattern):
+    """
+    Translate one fnmatch pattern into an anchored regex.
+
+    A pattern containing '/' is matched against the whole path from the
+    crawl root ("v1/*" matches "v1/a.py" but not "src/api/v1/a.py"), unless
+    it starts with "**/", which lets the rest match below any directory.
+    A pattern without '/' is matched against the file name or any trailing
+    part of the path, so "Dockerfile" matches "app/Dockerfile".
+    """
+    if pattern.startswith("**/"):
+        return "(?:^|/)" + fnmatch.translate(pattern[3:])
+    if "/" in pattern:
+        return "^" + fnmatch.translate(pattern)
+    return "(?:^|/)" + fnmatch.translate(pattern)
+
+def _compile(patterns):
+    """Compile fnmatch patterns (see _translate) into one regex, or None if there are none"""
+    if not patterns:
+        return None
+    flags = re.IGNORECASE if _CASE_INSENSITIVE else 0
+    alternatives = "|".join(f"(?:{_translate(p)})" for p in sorted(patterns))
+    return re.compile(alternatives, flags)
+
+def normalize_path(path):
+    """Use forward slashes so patterns behave the same on every platform"""
+    return path.replace("\\", "/")
+
+def _stem_key(path):
+    """Directory plus the file name up to its first dot ("a/Foo.aspx.cs" -> ("a", "Foo"))"""
+    directory, _, name = normalize_path(path).rpartition("/")
+    return directory, name.split(".", 1)[0]
+
+def is_binary_name(filename):
+    """Check the file extension against the list of known binary formats"""
+    filename = filename.lower()
+    return os.path.splitext(filename)[1] in BINARY_EXTENSIONS or filename == '.ds_store'
+
+def looks_binary(chunk):
+    """Check for null bytes or a high percentage of non-printable chars"""
+    if b'\x00' in chunk:
+        return True
+    return sum(c < 9 or 13 < c < 32 or c > 126 for c in chunk) > len(chunk) * 0.1
+
+def decode_text(data):
+    """
+    Sniff the first 1 KB for binary content and decode as UTF-8.
+
+    Returns:
+        str or None: The decoded content with normalized newlines, or None if
+                     the data is binary or not valid UTF-8
+    """
+    if looks_binary(data[:1024]):
+        return None
+    try:
+        # Match the newline handling of a text-mode read
+        return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    except UnicodeDecodeError:
+        return None
+
+class PathFilter:
+    """
+    Precompiled include/exclude/size matcher shared by the crawlers.
+
+    All patterns are combined into a single regex per list, paths always use
+    forward slashes, and skipped files are tallied per reason instead of being
+    printed one by one.
+    """
+
+    def __init__(self, include_patterns=None, exclude_patterns=None, max_file_size=None):
+        self.include_patterns = _as_set(include_patterns)
+        self.exclude_patterns = _as_set(exclude_patterns)
+        self.max_file_size = max_file_size
+        self._include_re = _compile(self.include_patterns)
+        self._exclude_re = _compile(self.exclude_patterns)
+        # Only a trailing '*' can swallow everything below a directory
+        self._prune_re = _compile({p for p in self.exclude_patterns if p.endswith("*")})
+        self.skipped = Counter()
+        self._lock = threading.Lock()
+        self.scope = None
+        self._scope_stems = set()
+        self._scope_dirs = set()
+
+    def restrict(self, paths, with_siblings=True):
+        """
+        Limit the filter to the given paths, e.g. the files changed since a ref.
+
+        With with_siblings, files in the same directory that share a changed
+        file's stem ("Foo.aspx" -> "Foo.aspx.cs", "Foo.js") are kept as context.
+        """
+        self.scope = {normalize_path(p) for p in paths}
+        self._scope_stems = {_stem_key(p) for p in self.scope} if with_siblings else set()
+        self._scope_dirs = set()
+        for path in self.scope:
+            parts = path.split("/")[:-1]
+            for i in range(1, len(parts) + 1):
+                self._scope_dirs.add("/".join(parts[:i]))
+
+    def in_scope(self, path):
+        """Return True if no scope is set or the path (or a sibling) is in it"""
+        if self.scope is None:
+            return True
+        path = normalize_path(path)
+        return path in self.scope or _stem_key(path) in self._scope_stems
+
+    def matches(self, path):
+        """Return True if the path passes the include and exclude patterns"""
+        path = normalize_path(path)
+        if self._include_re is not None and not self._include_re.search(path):
+            return False
+        if self._exclude_re is not None and self._exclude_re.search(path):
+            return False
+        return True
+
+    def can_skip_dir(self, dir_path):
+        """
+        Return True if every file below dir_path would be excluded.
+
+        A pattern ending in '*' that matches "dir_path/" also matches anything
+        appended to it, so the whole subtree can be pruned without descending.
+        With a scope, directories holding no scoped path are pruned too.
+        """
+        dir_path = normalize_path(dir_path).rstrip("/")
+        if self.scope is not None and dir_path not in self._scope_dirs:
+            return True
+        if self._prune_re is None:
+            return False
+        return self._prune_re.search(dir_path + "/") is not None
+
+    def too_large(self, size):
+        """Return True if size exceeds the configured limit"""
+        return bool(self.max_file_size) and size is not None and size > self.max_file_size
+
+    def skip_reason(self, path, size=None):
+        """
+        Apply pattern, binary-extension and size checks without counting.
+
+        Returns:
+            str or None: "unchanged", "pattern", "binary" or "size" if the file should be skipped
+        """
+        if not self.in_scope(path):
+            return "unchanged"
+        if not self.matches(path):
+            return "pattern"
+        if is_binary_name(os.path.basename(normalize_path(path))):
+            return "binary"
+        if self.too_large(size):
+            return "size"
+        return None
+
+    def check(self, path, size=None):
+        """
+        Apply pattern, binary-extension and size checks, counting any skip.
+
+        Returns:
+            bool: True if the file should be fetched
+        """
+        reason = self.skip_reason(path, size)
+        if reason:
+            self.record_skip(reason)
+            return False
+        return True
+
+    def record_skip(self, reason, count=1):
+        """Tally a skipped file under the given reason (thread-safe)"""
+        with self._lock:
+            self.skipped[reason] += count
+
+    def summary(self):
+        """Return a one-line report of the skip counters"""
+        if not self.skipped:
+            return "Skipped 0 files."
+        details = ", ".join(f"{reason}: {count}" for reason, count in sorted(self.skipped.items()))
+        return f"Skipped {sum(self.skipped.values())} files ({details})."
@@ -0,0 +1,76 @@
+import os
+import time
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+class FileLock:
+    """
+    Exclusive inter-process lock on a lock file (fcntl on POSIX, msvcrt on Windows).
+
+    Used as a context manager, which blocks until the lock is acquired, or
+    through acquire()/release() (acquire(blocking=False) tests whether
+    another holder is alive). The lock is released when the holder exits or
+    dies, so a crashed run never leaves a stale lock behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self, blocking=True):
+        """
+        Take the lock.
+
+        Args:
+            blocking (bool): Wait for the lock; otherwise give up at once if another holder has it
+
+        Returns:
+            bool: True if the lock is now held
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, "a+b")
+        try:
+            if os.name == "nt":
+                self._file.seek(0)
+                while True:
+                    try:
+                        # LK_LOCK itself retries for ~10 seconds before raising
+                        msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+                        time.sleep(1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._file.close()
+            self._file = None
+            if blocking:
+                raise
+            return False
+        return True
+
+    def release(self):
+        """Release the lock (no-op if it is not held)"""
+        if self._file is None:
+            return
+        try:
+            if os.name == "nt":
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
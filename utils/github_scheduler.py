@@ -0,0 +1,192 @@
+import os
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Spread the last PACE_FRACTION of a token's budget evenly over the time left until reset
+PACE_FRACTION = 0.1
+
+# Backoff for secondary rate limits (abuse detection, 429s) without a Retry-After header
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+MAX_RETRIES = 6
+
+def resolve_tokens(token=None):
+    """
+    Build the token pool from an explicit token and the GITHUB_TOKENS env var.
+
+    Returns:
+        list: Distinct tokens in priority order, or [None] for anonymous access
+    """
+    tokens = [token] if token else []
+    for extra in os.environ.get("GITHUB_TOKENS", "").split(","):
+        extra = extra.strip()
+        if extra and extra not in tokens:
+            tokens.append(extra)
+    return tokens or [None]
+
+def _header_int(headers, name):
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+class _TokenBudget:
+    """Rate-limit state of one token as last reported by GitHub"""
+
+    def __init__(self, token):
+        self.token = token
+        self.limit = None
+        self.remaining = None
+        self.reset = 0.0
+        self.next_at = 0.0
+
+    def refresh(self, now):
+        """Forget the exhausted budget once its reset time has passed"""
+        if self.reset and now >= self.reset:
+            self.remaining = None
+            self.reset = 0.0
+            self.next_at = 0.0
+
+    def available(self):
+        return self.remaining is None or self.remaining > 0
+
+    def label(self):
+        return f"token ...{self.token[-4:]}" if self.token else "anonymous access"
+
+class RateLimitScheduler:
+    """
+    Pooled HTTP client for the GitHub crawler that schedules requests against the rate limit.
+
+    Every API response updates the budget of the token that made it from the
+    X-RateLimit-* headers. Requests go to the token with the most budget left;
+    once a token is down to its last PACE_FRACTION, its remaining calls are
+    spaced out until the reset instead of being spent at once. An exhausted
+    token is rotated out, and the scheduler only sleeps when every token in the
+    pool is exhausted. Secondary rate limits are retried after Retry-After, or
+    with exponential backoff and jitter.
+
+    With an HttpCache, plain GETs are revalidated with If-None-Match /
+    If-Modified-Since and 304s are answered from disk.
+
+    Exposes get() and close() so it can stand in for a requests.Session.
+    """
+
+    def __init__(self, tokens=None, api_url="https://api.github.com", max_workers=8, cache=None):
+        self.api_url = api_url
+        self.cache = cache
+        self.budgets = [_TokenBudget(t) for t in (tokens or [None])]
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(max_workers, 10))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept"] = "application/vnd.github.v3+json"
+        self._lock = threading.Lock()
+
+    @property
+    def has_token(self):
+        return any(b.token for b in self.budgets)
+
+    def _acquire(self, paced):
+        """Pick a token, sleeping if the pool is exhausted or the chosen token is being paced"""
+        while True:
+            with self._lock:
+                now = time.time()
+                for budget in self.budgets:
+                    budget.refresh(now)
+                candidates = [b for b in self.budgets if b.available()]
+                if candidates:
+                    # Unknown budgets are tried first, then the one with the most calls left
+                    budget = max(candidates, key=lambda b: float("inf") if b.remaining is None else b.remaining)
+                    if not paced:
+                        return budget
+                    wait = budget.next_at - now
+                    if wait <= 0:
+                        if budget.remaining is not None:
+                            # Reserve the call so concurrent workers don't overspend
+                            budget.remaining -= 1
+                            if budget.limit and budget.remaining < budget.limit * PACE_FRACTION:
+                                budget.next_at = now + max(budget.reset - now, 0) / max(budget.remaining, 1)
+                        return budget
+                else:
+                    wait = max(min(b.reset for b in self.budgets) - now, 0) + 1
+                    print(f"Rate limit exhausted for all {len(self.budgets)} token(s). Waiting for {wait:.0f} seconds...")
+            time.sleep(wait)
+
+    def _update(self, budget, response):
+        """Record the budget reported by an API response"""
+        remaining = _header_int(response.headers, "X-RateLimit-Remaining")
+        if remaining is None:
+            return
+        with self._lock:
+            budget.remaining = remaining
+            budget.limit = _header_int(response.headers, "X-RateLimit-Limit") or budget.limit
+            budget.reset = float(_header_int(response.headers, "X-RateLimit-Reset") or budget.reset)
+
+    def get(self, url, use_cache=True, **kwargs):
+        """
+        GET a URL with the best available token, handling primary and secondary rate limits.
+
+        Args:
+            url (str): URL to fetch
+            use_cache (bool): Revalidate through the HTTP cache (if any); file
+                              bodies pass False because the blob store keeps them
+            **kwargs: Passed to requests (params, headers, stream, ...)
+
+        Returns:
+            requests.Response: The final response (the last one if retries run out)
+        """
+        # Streamed bodies (tarballs) bypass the HTTP cache
+        if self.cache is None or not use_cache or kwargs.get("stream"):
+            return self._fetch(url, **kwargs)
+
+        params = kwargs.get("params")
+        entry = self.cache.lookup(url, params)
+        if entry is not None:
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **self.cache.conditional_headers(entry))
+        response = self._fetch(url, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            return self.cache.replay(entry, url, response)
+        if response.status_code == 200:
+            self.cache.save(url, params, response)
+        return response
+
+    def _fetch(self, url, **kwargs):
+        """Send a GET, retrying on rate limits"""
+        # Only API calls count against the budget; raw/codeload downloads are not paced
+        paced = url.startswith(self.api_url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        for attempt in range(MAX_RETRIES + 1):
+            budget = self._acquire(paced)
+            if budget.token:
+                headers["Authorization"] = f"token {budget.token}"
+            response = self.session.get(url, headers=headers, **kwargs)
+            self._update(budget, response)
+            if response.status_code not in (403, 429) or attempt == MAX_RETRIES:
+                return response
+
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                # Primary limit: rotate to another token (or wait for the reset)
+                print(f"Rate limit exceeded for {budget.label()}; switching tokens...")
+                response.close()
+                continue
+
+            retry_after = _header_int(response.headers, "Retry-After")
+            if retry_after is None and "secondary rate limit" not in response.text.lower() \
+                    and "abuse" not in response.text.lower():
+                # A genuine permission error, not throttling
+                return response
+            if retry_after is not None:
+                wait = retry_after
+            else:
+                wait = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"Secondary rate limit hit. Backing off for {wait:.0f} seconds...")
+            response.close()
+            time.sleep(wait)
+        return response
+
+    def close(self):
+        self.session.close()
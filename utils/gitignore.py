@@ -0,0 +1,151 @@
+import os
+import re
+import git
+
+def git_ls_files(directory):
+    """
+    List the files git considers part of a work tree: tracked plus untracked-not-ignored.
+
+    Honors every .gitignore, .git/info/exclude and core.excludesFile the way
+    git itself does.
+
+    A directory the enclosing work tree ignores (e.g. a build output or a
+    checkout nested under an ignored path) would list nothing, so None is
+    returned for it too, and for an empty listing, letting the caller walk
+    the directory itself.
+
+    Returns:
+        list or None: Paths relative to directory (forward slashes), or None if
+                      directory is not inside a git work tree, is ignored by it,
+                      or git lists no files
+    """
+    try:
+        g = git.Git(directory)
+        if g.rev_parse("--is-inside-work-tree").strip() != "true":
+            return None
+    except (git.GitCommandError, OSError):
+        return None
+    try:
+        # Exits 0 when the path is ignored, 1 (raising) when it is not
+        g.check_ignore("-q", ".")
+        print(f"Warning: {directory} is ignored by its git work tree; not using the git index")
+        return None
+    except (git.GitCommandError, OSError):
+        pass
+    try:
+        output = g.ls_files("--cached", "--others", "--exclude-standard", "-z")
+    except (git.GitCommandError, OSError):
+        return None
+    # A file both staged and modified is listed once; deduplicate while keeping order
+    paths = list(dict.fromkeys(p for p in output.split("\0") if p))
+    if not paths:
+        print(f"Warning: git lists no files in {directory}; not using the git index")
+        return None
+    return paths
+
+def _translate(pattern):
+    """Translate one gitignore glob (without '!' or trailing '/') into a regex body"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            out.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape("["))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+def _parse_line(line):
+    """
+    Parse one .gitignore line.
+
+    Returns:
+        tuple or None: (regex, negate, dir_only), or None for blanks and comments
+    """
+    line = line.rstrip("\n").rstrip("\r")
+    # Trailing spaces are ignored unless escaped
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+    if not line or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # A slash at the start or in the middle anchors the pattern to the .gitignore's directory
+    anchored = "/" in line
+    body = _translate(line.lstrip("/"))
+    regex = re.compile(("^" if anchored else "^(?:.*/)?") + body + "$")
+    return regex, negate, dir_only
+
+class GitIgnore:
+    """
+    Native .gitignore matcher for directories that are not git work trees.
+
+    Rules are loaded per directory as the crawler descends; a path is checked
+    against the rules of every .gitignore above it, and the last matching rule
+    wins (deeper files override shallower ones). Ignored directories are meant
+    to be pruned, so their contents cannot be re-included, as in git.
+    """
+
+    def __init__(self):
+        self.rules = []
+
+    def load(self, abs_dir, rel_dir):
+        """Load abs_dir/.gitignore (if any) for paths below rel_dir"""
+        path = os.path.join(abs_dir, ".gitignore")
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            rule = _parse_line(line)
+            if rule:
+                self.rules.append((rel_dir,) + rule)
+
+    def is_ignored(self, rel_path, is_dir=False):
+        """Return True if rel_path (forward slashes, relative to the crawl root) is ignored"""
+        ignored = False
+        for base, regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                local = rel_path[len(base) + 1:]
+            else:
+                local = rel_path
+            if regex.match(local):
+                ignored = not negate
+        return ignored
@@ -0,0 +1,94 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import requests
+from urllib.parse import urlencode
+from utils.content_store import ContentStore, content_hash
+
+# Response headers kept with a cached body
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+class HttpCache:
+    """
+    On-disk cache of GET responses keyed by URL, revalidated with conditional requests.
+
+    Each entry stores the ETag/Last-Modified validators and the hash of the
+    body; bodies live in a content-addressed store, so identical responses
+    from different URLs are kept once. A cached entry is sent back as
+    If-None-Match / If-Modified-Since, and a 304 reply is answered from disk
+    (304s do not count against GitHub's primary rate limit).
+    """
+
+    def __init__(self, root):
+        self.meta_dir = os.path.join(root, "meta")
+        self.store = ContentStore(os.path.join(root, "objects"))
+        os.makedirs(self.meta_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _meta_path(self, url, params):
+        key = url + ("?" + urlencode(sorted(params.items())) if params else "")
+        return os.path.join(self.meta_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def lookup(self, url, params=None):
+        """
+        Load the entry for a URL.
+
+        Returns:
+            dict or None: {"headers", "hash"}, or None if nothing usable is cached
+        """
+        try:
+            with open(self._meta_path(url, params), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self.store.has(entry.get("hash", "")):
+            return None
+        return entry
+
+    def conditional_headers(self, entry):
+        """Build the revalidation headers for a cached entry"""
+        headers = {}
+        if entry["headers"].get("ETag"):
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if entry["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    def replay(self, entry, url, response_304):
+        """Turn a 304 into a 200 response carrying the cached body"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = self.store.get(entry["hash"])
+        response.headers.update(entry["headers"])
+        # Keep the fresh rate-limit headers from the 304
+        response.headers.update({k: v for k, v in response_304.headers.items() if k.startswith("X-RateLimit")})
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        with self._lock:
+            self.hits += 1
+        return response
+
+    def save(self, url, params, response):
+        """Store a 200 response if it carries a validator"""
+        with self._lock:
+            self.misses += 1
+        headers = {k: response.headers[k] for k in _KEPT_HEADERS if k in response.headers}
+        if "ETag" not in headers and "Last-Modified" not in headers:
+            return
+        body = response.content
+        digest = content_hash(body)
+        self.store.put(digest, body)
+        path = self._meta_path(url, params)
+        fd, tmp_path = tempfile.mkstemp(dir=self.meta_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "headers": headers, "hash": digest}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write HTTP cache entry for {url}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from utils.content_store import content_hash
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is used when zstandard is not installed
+    zstandard = None
+
+# Seconds a writer waits for another process's write lock before failing
+BUSY_TIMEOUT = 30.0
+# Bump when the meaning of cached responses changes for every prompt
+CACHE_KEY_VERSION = 1
+# Version of the prompt templates; callers may pass their own per template
+DEFAULT_PROMPT_VERSION = "1"
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+# Byte budget of the in-process tier and the largest single response it keeps
+DEFAULT_MEMORY_CACHE_BYTES = int(float(os.getenv("LLM_MEMORY_CACHE_MB", "64")) * 1024 * 1024)
+DEFAULT_MEMORY_ENTRY_BYTES = int(float(os.getenv("LLM_MEMORY_CACHE_MAX_ENTRY_MB", "4")) * 1024 * 1024)
+
+# PRAGMA user_version of the current schema; 0 is a fresh file or the first
+# (uncompressed, prompt-hash keyed) "responses" table
+SCHEMA_VERSION = 2
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    codec TEXT NOT NULL,
+    model TEXT,
+    created_at REAL NOT NULL,
+    latency_ms REAL,
+    prompt_tokens INTEGER,
+    response_tokens INTEGER,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def prompt_key(prompt):
+    """Return the hash of a prompt (SHA-256 of its UTF-8 text)"""
+    return content_hash(prompt)
+
+def cache_key(prompt_hash, model, config=None, prompt_version=DEFAULT_PROMPT_VERSION):
+    """
+    Return the cache key of a request.
+
+    The key is a digest of everything that determines the response: the
+    model, the generation config, the prompt template version and the
+    prompt (by its hash), so changing any of them misses the cache.
+
+    Args:
+        prompt_hash (str): prompt_key() of the prompt
+        model (str): Model name
+        config (dict, optional): Generation config (JSON-serializable)
+        prompt_version (str): Prompt template version
+    """
+    material = json.dumps([CACHE_KEY_VERSION, model, config or {}, str(prompt_version), prompt_hash],
+                          sort_keys=True, separators=(",", ":"))
+    return content_hash(material)
+
+def compress(text):
+    """Compress a response; returns (codec, bytes)"""
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, ZLIB_LEVEL)
+
+def decompress(codec, blob):
+    """
+    Decompress a stored response.
+
+    Returns:
+        str or None: The response, or None if the codec is unavailable here
+    """
+    if codec == "zlib":
+        return zlib.decompress(blob).decode("utf-8")
+    if codec == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+    return None
+
+class LLMCache:
+    """
+    Persistent LLM response cache in a SQLite database.
+
+    The database runs in WAL mode, so any number of threads and processes
+    (CLI runs, Streamlit sessions) can read while one writes; each write is a
+    single atomic upsert of one entry, never a rewrite of the whole cache.
+    Every thread gets its own connection. Values are stored compressed with
+    their model, creation time, latency and token counts.
+
+    Entries written before keys were versioned (the first SQLite schema and
+    llm_cache.json) only identify the prompt; they are adopted under
+    legacy_model, the model configured when they are upgraded.
+    """
+
+    def __init__(self, path, legacy_json=None, legacy_model=None):
+        self.path = path
+        self.legacy_model = legacy_model
+        self._local = threading.local()
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        self._upgrade()
+        if legacy_json and os.path.exists(legacy_json):
+            self._migrate_json(legacy_json)
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _legacy_rows(self, items, now):
+        """Turn (prompt hash, response) pairs into entries rows under legacy_model"""
+        for prompt_hash, response in items:
+            if not isinstance(response, str):
+                continue
+            codec, blob = compress(response)
+            yield (cache_key(prompt_hash, self.legacy_model), blob, codec, self.legacy_model,
+                   now, None, None, None, len(response.encode("utf-8")))
+
+    def _insert_legacy(self, conn, items):
+        conn.executemany(
+            "INSERT OR IGNORE INTO entries (key, value, codec, model, created_at, latency_ms, "
+            "prompt_tokens, response_tokens, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._legacy_rows(items, time.time()))
+
+    def _upgrade(self):
+        """Create the schema, converting a first-version responses table in place"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                # executescript() would commit the open transaction, so run statements singly
+                for statement in _SCHEMA.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+                has_v1 = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'responses'").fetchone()
+                if has_v1:
+                    self._insert_legacy(conn, conn.execute("SELECT key, response FROM responses").fetchall())
+                    conn.execute("DROP TABLE responses")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _migrate_json(self, json_path):
+        """
+        Import the entries of a legacy llm_cache.json once.
+
+        The import runs in one write transaction and is recorded in the meta
+        table, so concurrent first runs import it exactly once. Existing
+        entries win over the JSON copy; the JSON file is left in place.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute("SELECT 1 FROM meta WHERE name = 'json_migrated'").fetchone()
+            if done:
+                conn.execute("COMMIT")
+                return
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not migrate LLM cache {json_path}: {e}")
+                legacy = {}
+            self._insert_legacy(conn, ((prompt_key(prompt), response) for prompt, response in legacy.items()))
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('json_migrated', ?)", (json_path,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if legacy:
+            print(f"Migrated {len(legacy)} LLM cache entries from {json_path} to {self.path}")
+
+    def get(self, key):
+        """
+        Look up a cached response by cache_key().
+
+        Returns:
+            str or None: The response, or None on a miss
+        """
+        row = self._connect().execute(
+            "SELECT codec, value FROM entries WHERE key = ?", (key,)).fetchone()
+        return decompress(*row) if row else None
+
+    def put(self, key, response, model=None, latency_ms=None, prompt_tokens=None, response_tokens=None):
+        """
+        Store (or replace) a response with its metadata.
+
+        Args:
+            key (str): cache_key() of the request
+            response (str): Response text
+            model (str, optional): Model that produced it
+            latency_ms (float, optional): Time the provider took to answer
+            prompt_tokens (int, optional): Prompt token count reported by the provider
+            response_tokens (int, optional): Response token count reported by the provider
+        """
+        codec, blob = compress(response)
+        self._connect().execute(
+            "INSERT INTO entries (key, value, codec, model, created_at, latency_ms, prompt_tokens, "
+            "response_tokens, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, codec = excluded.codec, "
+            "model = excluded.model, created_at = excluded.created_at, latency_ms = excluded.latency_ms, "
+            "prompt_tokens = excluded.prompt_tokens, response_tokens = excluded.response_tokens, "
+            "size = excluded.size",
+            (key, blob, codec, model, time.time(), latency_ms, prompt_tokens, response_tokens,
+             len(response.encode("utf-8"))))
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+class MemoryCache:
+    """
+    Thread-safe in-process LRU of responses, bounded by bytes rather than entries.
+
+    Sits in front of LLMCache so repeated lookups within a run (or across
+    Streamlit reruns in one server process) do not touch disk. Each entry is
+    charged the in-memory size of its key and response; the least recently
+    used entries are evicted once the total exceeds max_bytes. Responses
+    larger than max_entry_bytes are not kept.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_CACHE_BYTES, max_entry_bytes=DEFAULT_MEMORY_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (response, charged bytes)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Look up a response and mark it as recently used.
+
+        Returns:
+            str or None: The response, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, response):
+        """Keep a response, evicting least recently used entries to stay within max_bytes"""
+        size = sys.getsizeof(key) + sys.getsizeof(response)
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (response, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Return the hit/miss/eviction counters and current usage"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
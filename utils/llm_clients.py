@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import weakref
+import threading
+from contextlib import contextmanager
+
+def _gemini_client(api_key):
+    """Create a google-genai client; it keeps its HTTP connections alive between calls"""
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+# provider -> factory(**credentials) returning a client
+_factories = {"gemini": _gemini_client}
+# (provider, credentials digest) -> client
+_clients = {}
+# event loop -> {(provider, credentials digest): async client}
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+def _registry_key(provider, credentials):
+    """Key a client by provider and a digest of its credentials (secrets are not kept as keys)"""
+    material = repr(sorted(credentials.items())).encode("utf-8")
+    return provider, hashlib.sha256(material).hexdigest()
+
+def get_client(provider="gemini", **credentials):
+    """
+    Return the shared client for a provider and set of credentials.
+
+    Clients are created lazily, once per (provider, credentials), and reused
+    by every later call in the process, so connection setup and TLS
+    handshakes are paid once. Creation is serialized by a lock; the clients
+    themselves are safe to use from several threads.
+
+    Args:
+        provider (str): Provider name (a registered factory)
+        **credentials: Keyword arguments for the factory (e.g. api_key)
+
+    Returns:
+        object: The client
+    """
+    key = _registry_key(provider, credentials)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            factory = _factories.get(provider)
+            if factory is None:
+                raise ValueError(f"Unknown LLM provider: {provider}")
+            client = factory(**credentials)
+            _clients[key] = client
+        return client
+
+def get_async_client(provider="gemini", **credentials):
+    """
+    Return the shared async client for a provider and credentials in the running event loop.
+
+    Async HTTP connection pools belong to the event loop that opened them, so
+    a client is created (from the provider factory's .aio interface) once
+    per loop and forgotten when the loop is garbage collected.
+
+    Returns:
+        object: The async client
+    """
+    loop = asyncio.get_running_loop()
+    key = _registry_key(provider, credentials)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            factory = _factories.get(provider)
+            if factory is None:
+                raise ValueError(f"Unknown LLM provider: {provider}")
+            client = clients[key] = factory(**credentials).aio
+        return client
+
+async def aclose_async_clients():
+    """
+    Close and forget the async clients of the running event loop.
+
+    Call before the loop ends (e.g. at the end of the coroutine passed to
+    asyncio.run) so each client's connection pool is shut down instead of
+    being leaked with the loop.
+    """
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        aclose = getattr(client, "aclose", None)
+        if callable(aclose):
+            try:
+                await aclose()
+            except Exception:
+                pass
+
+def register_factory(provider, factory):
+    """
+    Set the factory that creates clients for a provider.
+
+    Clients already created for the provider are dropped, so the next
+    get_client() uses the new factory. Tests use this to swap in a client
+    backed by a local fake transport.
+
+    Returns:
+        callable or None: The previous factory
+    """
+    with _lock:
+        previous = _factories.get(provider)
+        _factories[provider] = factory
+        _drop(provider)
+    return previous
+
+@contextmanager
+def use_factory(provider, factory):
+    """Temporarily replace a provider's client factory (e.g. with a fake in tests)"""
+    previous = register_factory(provider, factory)
+    try:
+        yield
+    finally:
+        if previous is None:
+            with _lock:
+                _factories.pop(provider, None)
+                _drop(provider)
+        else:
+            register_factory(provider, previous)
+
+def _drop(provider=None):
+    """Forget (and close, where supported) the clients of one or all providers; caller holds _lock"""
+    for clients in _async_clients.values():
+        for key in [k for k in clients if provider is None or k[0] == provider]:
+            del clients[key]
+    for key in [k for k in _clients if provider is None or k[0] == provider]:
+        client = _clients.pop(key)
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+def reset_clients():
+    """Close and forget every client (e.g. after fork or to pick up new settings)"""
+    with _lock:
+        _drop()
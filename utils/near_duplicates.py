@@ -0,0 +1,137 @@
+import os
+import re
+import zlib
+import difflib
+import numpy as np
+
+# Files whose estimated Jaccard similarity reaches this are clustered together
+NEAR_DUP_THRESHOLD = float(os.getenv("QA_DOC_NEAR_DUP_THRESHOLD", "0.8"))
+# MinHash signature length; LSH splits it into NEAR_DUP_BANDS bands
+NEAR_DUP_PERMUTATIONS = 128
+NEAR_DUP_BANDS = 16
+# Shingles are runs of this many tokens
+SHINGLE_SIZE = 5
+# Files with fewer shingles than this are too small to cluster meaningfully
+MIN_SHINGLES = 20
+# Shingles are hashed against the permutations in chunks to bound memory
+_CHUNK = 8192
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_MASK = np.uint64(0xFFFFFFFF)
+
+def _permutations(seed=1):
+    """Return the (a, b) coefficients of the MinHash permutations, a odd"""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 1 << 31, size=NEAR_DUP_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.randint(0, 1 << 32, size=NEAR_DUP_PERMUTATIONS, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+_PERM_A, _PERM_B = _permutations()
+
+def shingle_hashes(content):
+    """
+    Hash every run of SHINGLE_SIZE tokens of a text to a 32-bit value.
+
+    Tokens are hashed once (CRC-32) and combined into shingles with a
+    vectorized polynomial rolling hash.
+
+    Returns:
+        numpy.ndarray: Unique uint64 shingle hashes (values below 2**32)
+    """
+    tokens = _TOKEN.findall(content)
+    if len(tokens) < SHINGLE_SIZE:
+        return np.empty(0, dtype=np.uint64)
+    token_hashes = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens),
+                               dtype=np.uint64, count=len(tokens))
+    count = len(tokens) - SHINGLE_SIZE + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        shingles = (shingles * np.uint64(1000003) + token_hashes[offset:offset + count]) & _MASK
+    return np.unique(shingles)
+
+def minhash_signature(shingles):
+    """
+    Compute the MinHash signature of a set of shingle hashes.
+
+    Each permutation is (a * x + b) mod 2**32, evaluated for all shingles at
+    once; products stay below 2**64, so uint64 arithmetic is exact.
+
+    Returns:
+        numpy.ndarray: uint64 array of NEAR_DUP_PERMUTATIONS minimums
+    """
+    signature = np.full(NEAR_DUP_PERMUTATIONS, 0xFFFFFFFF, dtype=np.uint64)
+    for start in range(0, len(shingles), _CHUNK):
+        chunk = shingles[start:start + _CHUNK][None, :]
+        hashed = (_PERM_A * chunk + _PERM_B) & _MASK
+        np.minimum(signature, hashed.min(axis=1), out=signature)
+    return signature
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def cluster_near_duplicates(files_data, indices=None, threshold=NEAR_DUP_THRESHOLD):
+    """
+    Cluster files whose contents are near-copies of each other.
+
+    Candidate pairs come from LSH banding of the MinHash signatures and are
+    kept when their estimated Jaccard similarity reaches threshold; clusters
+    are the connected components of the kept pairs.
+
+    Args:
+        files_data (list): List of (path, content) tuples
+        indices (iterable, optional): File indices to consider (default: all)
+        threshold (float): Minimum estimated Jaccard similarity
+
+    Returns:
+        list: Clusters as sorted lists of file indices (only clusters with 2+ files)
+    """
+    if indices is None:
+        indices = range(len(files_data))
+    members, signatures = [], []
+    for i in indices:
+        shingles = shingle_hashes(files_data[i][1])
+        if len(shingles) >= MIN_SHINGLES:
+            members.append(i)
+            signatures.append(minhash_signature(shingles))
+    if len(members) < 2:
+        return []
+    signatures = np.vstack(signatures)
+
+    rows = NEAR_DUP_PERMUTATIONS // NEAR_DUP_BANDS
+    parent = list(range(len(members)))
+    checked = set()
+    for band in range(NEAR_DUP_BANDS):
+        buckets = {}
+        for pos, key in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(key.tobytes(), []).append(pos)
+        for bucket in buckets.values():
+            first = bucket[0]
+            for other in bucket[1:]:
+                if (first, other) in checked:
+                    continue
+                checked.add((first, other))
+                similarity = np.count_nonzero(signatures[first] == signatures[other]) / NEAR_DUP_PERMUTATIONS
+                if similarity >= threshold:
+                    parent[_find(parent, other)] = _find(parent, first)
+
+    clusters = {}
+    for pos, i in enumerate(members):
+        clusters.setdefault(_find(parent, pos), []).append(i)
+    return [sorted(c) for c in clusters.values() if len(c) > 1]
+
+def compact_diff(base_content, content, base_name, name):
+    """
+    Return a unified diff (one line of context) turning base_content into content.
+
+    Returns:
+        str or None: The diff, or None if it is not shorter than content itself
+    """
+    diff = "".join(difflib.unified_diff(
+        base_content.splitlines(keepends=True), content.splitlines(keepends=True),
+        fromfile=base_name, tofile=name, n=1))
+    if len(diff) >= len(content):
+        return None
+    return diff
@@ -0,0 +1,123 @@
+import os
+import re
+import hashlib
+import tempfile
+import git
+from contextlib import contextmanager
+from utils.file_lock import FileLock
+
+def mirror_path(cache_dir, repo_url):
+    """Return the bare mirror directory for a repository URL"""
+    url = repo_url.strip().rstrip("/")
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", re.split(r"[/:]", url)[-1])[:40]
+    return os.path.join(cache_dir, "mirrors", f"{name}-{key}")
+
+def _filter_limit(repo):
+    """Return the blob:limit a partial repository was fetched with, or None"""
+    try:
+        spec = repo.git.config("--get", "remote.origin.partialclonefilter")
+    except git.GitCommandError:
+        return None
+    match = re.fullmatch(r"blob:limit=(\d+)([kmg]?)", spec.strip().lower())
+    if not match:
+        return None
+    return int(match.group(1)) * {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}[match.group(2)]
+
+def _fetch(repo, ref, max_file_size):
+    """Fetch ref at depth 1, leaving blobs over max_file_size on the server"""
+    fetch_args = ["--depth", "1"]
+    if max_file_size:
+        fetch_args.append(f"--filter=blob:limit={max_file_size}")
+    repo.git.fetch(*fetch_args, "origin", ref or "HEAD")
+    return repo.git.rev_parse("FETCH_HEAD")
+
+def _missing_blobs(repo, commit, max_file_size):
+    """
+    List blobs of the commit that were left on the server by the blob filter.
+
+    rev-list --missing=print reports them without triggering a lazy fetch. If
+    the repository was fetched with a smaller limit than max_file_size (an
+    older mirror), missing blobs may still be wanted, so none are reported and
+    reads fetch them on demand.
+    """
+    limit = _filter_limit(repo)
+    if limit is None or not max_file_size or limit < max_file_size:
+        return set()
+    return {line[1:] for line in repo.git.rev_list("--objects", "--missing=print", commit).splitlines()
+            if line.startswith("?")}
+
+def _fetch_refs(repo, ref, since, max_file_size):
+    """Fetch ref (and since, if given) and return their commits"""
+    commit = _fetch(repo, ref, max_file_size)
+    base = _fetch(repo, since, max_file_size) if since else None
+    return commit, base
+
+@contextmanager
+def open_commit(repo_url, ref=None, max_file_size=None, cache_dir=None, env=None, since=None):
+    """
+    Fetch a single commit into a bare repository and hold it open for reading.
+
+    Without cache_dir the repository lives in a temp dir for the duration of
+    the block. With cache_dir it is a persistent mirror under
+    <cache_dir>/mirrors keyed by URL: later runs only fetch what changed. The
+    fetch runs under an exclusive file lock so concurrent runs are safe;
+    reading needs no lock because git never rewrites existing objects. If the
+    fetch fails (e.g. offline), the commit last fetched for ref is reused.
+
+    Args:
+        repo_url (str): Git URL (SSH or HTTPS)
+        ref (str, optional): Branch, tag or commit (default: the remote HEAD)
+        max_file_size (int, optional): Blob size limit for the partial fetch
+        cache_dir (str, optional): Root of the crawl cache; None uses a temp dir
+        env (dict, optional): Extra environment for git (e.g. auth headers)
+        since (str, optional): A second ref to fetch (at depth 1) for diffing against
+
+    Yields:
+        tuple: (git.Repo, commit sha, set of blob shas left on the server,
+                commit sha of since or None)
+    """
+    if cache_dir is None:
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            print(f"Cloning {repo_url}{'@' + ref if ref else ''} to temp dir {tmpdirname} ...")
+            repo = git.Repo.init(tmpdirname, bare=True)
+            try:
+                repo.git.update_environment(**(env or {}))
+                repo.create_remote("origin", repo_url)
+                commit, base = _fetch_refs(repo, ref, since, max_file_size)
+                yield repo, commit, _missing_blobs(repo, commit, max_file_size), base
+            finally:
+                # Stop GitPython's cat-file processes before the temp dir is removed
+                repo.close()
+        return
+
+    path = mirror_path(cache_dir, repo_url)
+    cached_ref = f"refs/mirror/{ref or 'HEAD'}"
+    cached_since = f"refs/mirror/{since}" if since else None
+    with FileLock(path + ".lock"):
+        if os.path.isdir(path):
+            print(f"Updating mirror {path} ({repo_url}{'@' + ref if ref else ''}) ...")
+            repo = git.Repo(path)
+        else:
+            print(f"Creating mirror {path} for {repo_url}{'@' + ref if ref else ''} ...")
+            repo = git.Repo.init(path, bare=True)
+            repo.create_remote("origin", repo_url)
+        repo.git.update_environment(**(env or {}))
+        try:
+            commit, base = _fetch_refs(repo, ref, since, max_file_size)
+            repo.git.update_ref(cached_ref, commit)
+            if base:
+                repo.git.update_ref(cached_since, base)
+        except git.GitCommandError as e:
+            try:
+                commit = repo.git.rev_parse("--verify", f"{cached_ref}^{{commit}}")
+                base = repo.git.rev_parse("--verify", f"{cached_since}^{{commit}}") if since else None
+            except git.GitCommandError:
+                repo.close()
+                raise e
+            print(f"Warning: Could not update mirror ({e.stderr.strip()}); using cached commit {commit[:12]}")
+        missing = _missing_blobs(repo, commit, max_file_size)
+    try:
+        yield repo, commit, missing, base
+    finally:
+        repo.close()